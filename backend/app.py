@@ -1,21 +1,35 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends, BackgroundTasks, UploadFile, File
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, UploadFile, File, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse, Response, PlainTextResponse, JSONResponse
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from typing import Dict, List, Optional, Union, Set
+from typing import Dict, List, Optional, Union, Callable, Awaitable
 import asyncio
 import json
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from database.aws_connector import AWSConnector
-from database.oracle_connector import OracleConnector
 from models.flow_parser import FlowParser
 from services.status_service import StatusService
 from services.flow_service import FlowService
 from services.config_service import ConfigService
-from config import Settings, get_settings
+from services.poll_scheduler import PollScheduler
+from services.delta_service import DeltaService
+from services.connection_manager import ConnectionManager, EventStream
+from services.status_cache import StatusCache
+from services.eta_service import EtaService
+from services.history_service import HistoryService
+from services.task_service import TaskService
+from services.loop_monitor import LoopMonitor
+from services.poller_supervisor import PollerSupervisor
+from services.metrics import METRICS
+from services.coordinator import Coordinator
+from services.status_encoder import ENCODERS, EVENT_STREAM_ENCODERS, negotiate_accept, negotiate_subprotocol
+from config import get_settings
 
 app = FastAPI(title="DERIV Flow Tracker")
 
@@ -45,118 +59,364 @@ class StatusUpdate(BaseModel):
     stages: Dict[str, Dict]
 
 # WebSocket manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = {}
-
-    async def connect(self, websocket: WebSocket, flow_name: str):
-        await websocket.accept()
-        if flow_name not in self.active_connections:
-            self.active_connections[flow_name] = []
-        self.active_connections[flow_name].append(websocket)
+settings = get_settings()
+manager = ConnectionManager(
+    max_queue=settings.ws_queue_size,
+    send_timeout=settings.ws_send_timeout,
+    max_lag=settings.ws_max_lag
+)
 
-    def disconnect(self, websocket: WebSocket, flow_name: str):
-        if flow_name in self.active_connections:
-            self.active_connections[flow_name].remove(websocket)
-            if not self.active_connections[flow_name]:
-                del self.active_connections[flow_name]
+# Metrics
+METRICS.enabled = settings.metrics_enabled
+TICK_SECONDS = METRICS.histogram("flowtracker_tick_seconds", "Duration of a poll and publish tick per flow", ("flow",))
+SCHEDULE_LAG_SECONDS = METRICS.histogram(
+    "flowtracker_schedule_lag_seconds", "How late a tick started after its deadline per flow", ("flow",)
+)
+BROADCAST_SECONDS = METRICS.histogram(
+    "flowtracker_broadcast_seconds", "Time to fan a delta out to a flow's clients", ("flow",)
+)
+PARSE_SECONDS = METRICS.histogram("flowtracker_flow_parse_seconds", "Time to compile a flow definition", ("flow",))
 
-    async def broadcast(self, message: str, flow_name: str):
-        if flow_name in self.active_connections:
-            for connection in self.active_connections[flow_name]:
-                await connection.send_text(message)
+def collect_runtime_metrics():
+    """Gauges read from the services at scrape time"""
+    yield ("flowtracker_websocket_clients", "gauge", "Connected WebSocket clients per flow", [
+        ({"flow": flow_name}, len(websockets))
+        for flow_name, websockets in manager.active_connections.items()
+    ])
+    yield ("flowtracker_websocket_dropped_total", "counter", "Messages dropped for lagging clients per flow", [
+        ({"flow": flow_name}, stats["dropped"]) for flow_name, stats in manager.flow_stats.items()
+    ])
+    yield ("flowtracker_loop_lag_seconds", "gauge", "Last measured event loop lag", [
+        ({}, app.state.loop_monitor.last_lag_ms / 1000)
+    ])
+    # Connectors count the rows their queries return, not the keys they were asked for
+    yield ("flowtracker_source_rows_total", "counter", "Status rows returned per source", [
+        ({"source": source_key, "type": source.type_name}, source.rows_fetched)
+        for source_key, source in app.state.status_service.sources.items()
+    ])
+    yield ("flowtracker_pool_size", "gauge", "Open connections per source pool", [
+        ({"source": source_key}, stats.get("size") or 0)
+        for source_key, stats in app.state.status_service.pool_stats().items()
+    ])
+    yield ("flowtracker_poller_errors_total", "counter", "Failed ticks per poll group", [
+        ({"group": group_key}, stats["errors"])
+        for group_key, stats in app.state.poller_supervisor.get_stats().items()
+    ])
 
-manager = ConnectionManager()
+METRICS.add_collector(collect_runtime_metrics)
 
 # Services
 @app.on_event("startup")
 async def startup_event():
-    app.state.config_service = ConfigService("configs")
+    # Bounded pool for blocking file and driver calls, also used by asyncio.to_thread
+    app.state.io_executor = ThreadPoolExecutor(max_workers=settings.io_workers, thread_name_prefix="blocking-io")
+    asyncio.get_running_loop().set_default_executor(app.state.io_executor)
+    app.state.loop_monitor = LoopMonitor(settings.loop_lag_interval, settings.loop_lag_threshold_ms)
+    app.state.loop_monitor_task = asyncio.create_task(app.state.loop_monitor.run())
+    
+    app.state.config_service = ConfigService("configs", app.state.io_executor)
     app.state.flow_service = FlowService()
-    app.state.status_service = StatusService()
+    app.state.status_service = StatusService(
+        {"airflow": settings.aws_query_timeout, "oracle": settings.oracle_query_timeout},
+        pool_options={
+            "min_size": settings.pool_min_size,
+            "max_size": settings.pool_max_size,
+            "acquire_timeout": settings.pool_acquire_timeout,
+            "recycle": settings.pool_recycle,
+            "pre_ping": settings.pool_pre_ping
+        },
+        max_failures=settings.pool_max_failures
+    )
+    app.state.poll_scheduler = PollScheduler(
+        app.state.status_service,
+        active_interval=settings.poll_active_interval,
+        idle_factor=settings.poll_idle_factor,
+        max_interval=settings.poll_max_interval,
+        jitter=settings.poll_jitter
+    )
+    app.state.poller_supervisor = PollerSupervisor(settings.poller_restart_backoff, settings.poller_max_backoff)
+    app.state.coordinator = Coordinator(
+        settings.coordination_dir,
+        settings.coordination_interval,
+        enabled=settings.coordination_enabled
+    )
+    app.state.remote_watchers = {}  # Follower id to {flow name: subscribers}, on the leader
+    app.state.delta_service = DeltaService()
+    app.state.status_cache = StatusCache(settings.status_cache_ttl)
+    app.state.eta_service = EtaService(settings.eta_window, settings.eta_default_duration)
+    app.state.task_service = TaskService(settings.task_cache_runs, settings.task_running_ttl, settings.task_cache_pages)
+    # Only the leader writes history, followers read what it flushed
+    app.state.history_service = HistoryService(
+        settings.history_path,
+        settings.history_retention_days,
+        read_only=settings.coordination_enabled
+    )
+    await app.state.history_service.open()
+    app.state.history_writer = asyncio.create_task(
+        app.state.history_service.run(settings.history_flush_interval)
+    )
     
     # Load available flow configurations
-    flow_configs = app.state.config_service.list_configs()
+    flow_configs = await app.state.config_service.list_configs()
     for config_name in flow_configs:
-        config = app.state.config_service.load_config(config_name)
+        config = await app.state.config_service.load_config(config_name)
         if config:
             try:
-                # Parse flow definition
-                parser = FlowParser(config["flowDefinition"]["overall"], config["flowDefinition"]["subStages"])
-                parsed_flow = parser.parse()
-                
-                # Add to flow service
-                app.state.flow_service.add_flow(
-                    config["flowName"],
-                    parsed_flow,
-                    config["stageMappings"]["aws"],
-                    config["stageMappings"]["onPrem"],
-                    config["refreshInterval"]
-                )
-                
-                # Start background task for status updates
-                background_tasks = BackgroundTasks()
-                background_tasks.add_task(status_updater, config["flowName"])
-                
+                load_flow(config)
                 logging.info(f"Loaded flow configuration: {config['flowName']}")
             except Exception as e:
                 logging.error(f"Error loading flow configuration {config_name}: {e}")
+    
+    # Pick up config changes on disk
+    app.state.config_service.add_listener(on_config_change)
+    app.state.config_watcher = asyncio.create_task(
+        app.state.config_service.watch(settings.config_poll_interval)
+    )
+    
+    # Join the leader election, followers get status over the bus instead of polling
+    app.state.coordinator.snapshot = coordination_snapshot
+    app.state.coordinator.report = coordination_report
+    app.state.coordinator.add_promote_listener(on_promote)
+    app.state.coordinator.add_message_listener(on_bus_message)
+    app.state.coordinator.add_follower_listener(on_follower_message)
+    app.state.coordinator_task = asyncio.create_task(app.state.coordinator.run())
+    
+    # Detect dead peers on the multiplexed WebSocket
+    app.state.ws_heartbeat = asyncio.create_task(
+        manager.heartbeat(settings.ws_heartbeat_interval, settings.ws_heartbeat_timeout)
+    )
+
+def load_flow(config: Dict, previous: Optional[Dict] = None):
+    """Parse a flow config and register it with the flow service and the poller"""
+    flow_graph = app.state.flow_service.get_graph(config["flowName"])
+    if not (flow_graph and previous and previous.get("flowDefinition") == config["flowDefinition"]):
+        # Parse flow definition, unless unchanged
+        started = time.perf_counter()
+        parser = FlowParser(config["flowDefinition"]["overall"], config["flowDefinition"]["subStages"])
+        flow_graph = parser.compile()
+        PARSE_SECONDS.observe(time.perf_counter() - started, flow=config["flowName"])
+    
+    # Add to flow service
+    app.state.flow_service.add_flow(
+        config["flowName"],
+        flow_graph,
+        config["stageMappings"].get("aws", {}),
+        config["stageMappings"].get("onPrem", {}),
+        config["refreshInterval"]
+    )
+    
+    # Register with the poller for its database group
+    group_key, _ = app.state.poll_scheduler.register_flow(
+        config["flowName"],
+        config["databases"],
+        config["stageMappings"],
+        config["refreshInterval"]
+    )
+    
+    # Start the group's poller unless it is already running, followers wait to be promoted
+    if app.state.coordinator.is_leader:
+        app.state.poller_supervisor.start(group_key, status_updater, group_key)
+
+def unload_flow(flow_name: str):
+    """Remove a flow from the flow service and the poller"""
+    app.state.flow_service.remove_flow(flow_name)
+    app.state.poll_scheduler.unregister_flow(flow_name)
+    app.state.delta_service.remove_flow(flow_name)
+    app.state.status_cache.remove_flow(flow_name)
+    app.state.eta_service.remove_flow(flow_name)
+    METRICS.remove_labels("flow", flow_name)
+
+async def on_config_change(filename: str, config: Optional[Dict], previous: Optional[Dict]):
+    """Reload a flow whose config file changed on disk"""
+    if previous and (config is None or previous.get("flowName") != config.get("flowName")):
+        unload_flow(previous["flowName"])
+    if config:
+        load_flow(config, previous)
+        logging.info(f"Reloaded flow configuration: {config['flowName']}")
+
+def coordination_snapshot() -> List[Dict]:
+    """Cached status of every flow, sent to a follower when it attaches to the bus"""
+    return [
+        {"type": "status", "flows": {flow_name: entry["status"]}, "partial": False, "timestamp": entry["as_of"]}
+        for flow_name, entry in app.state.status_cache.entries.items()
+    ]
+
+def coordination_report() -> Dict:
+    """Subscriber counts of this follower, sent to the leader so it polls the flows watched here"""
+    return {
+        "type": "watch",
+        "flows": {flow_name: len(websockets) for flow_name, websockets in manager.active_connections.items()}
+    }
+
+async def on_follower_message(follower_id: int, message: Dict):
+    """Merge a follower's subscribers into the leader's polling and wake the groups it asks for"""
+    message_type = message.get("type")
+    if message_type == "watch":
+        app.state.remote_watchers[follower_id] = message.get("flows") or {}
+    elif message_type == "detach":
+        app.state.remote_watchers.pop(follower_id, None)
+    elif message_type == "wake":
+        wake_flow(message.get("flowName"))
+
+def is_watched(flow_name: str) -> bool:
+    """Whether a flow has subscribers on this worker or, on the leader, on any follower"""
+    return flow_name in manager.active_connections or any(
+        flows.get(flow_name) for flows in app.state.remote_watchers.values()
+    )
+
+def wake_flow(flow_name: str):
+    """Poll a flow's group now, e.g. for its first subscriber; followers ask the leader to"""
+    if app.state.coordinator.is_leader:
+        app.state.poll_scheduler.wake(app.state.poll_scheduler.flow_groups.get(flow_name))
+    else:
+        # The report goes first so the leader counts the flow as watched when it polls
+        app.state.coordinator.send_report()
+        app.state.coordinator.send_to_leader({"type": "wake", "flowName": flow_name})
+
+async def on_promote():
+    """Take over polling and history writes from the previous leader"""
+    await app.state.history_service.promote()
+    for group_key in app.state.poll_scheduler.list_groups():
+        app.state.poller_supervisor.start(group_key, status_updater, group_key)
+
+async def on_bus_message(message: Dict):
+    """Apply a status update relayed by the leader"""
+    if message.get("type") != "status":
+        return
+    group_status = {
+        flow_name: status for flow_name, status in message["flows"].items()
+        if flow_name in app.state.poll_scheduler.flow_groups
+    }
+    if not message["partial"]:
+        for flow_name, status in group_status.items():
+            app.state.status_cache.put(flow_name, status, message["timestamp"])
+    await publish_status(group_status, message["partial"], message["timestamp"])
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    app.state.coordinator_task.cancel()
+    app.state.config_watcher.cancel()
+    app.state.ws_heartbeat.cancel()
+    app.state.history_writer.cancel()
+    await app.state.history_service.close()
+    
+    await app.state.poller_supervisor.stop_all()
+    await app.state.coordinator.close()
+    
     # Close all database connections
     await app.state.status_service.close_all_connections()
+    
+    app.state.loop_monitor_task.cancel()
+    app.state.io_executor.shutdown(wait=False)
 
-async def status_updater(flow_name: str):
-    flow = app.state.flow_service.get_flow(flow_name)
-    if not flow:
-        logging.error(f"Flow {flow_name} not found")
-        return
+async def refresh_group(
+    group_key: str,
+    on_partial: Optional[Callable[[str, Dict[str, Dict]], Awaitable[None]]] = None
+) -> Dict[str, Dict]:
+    """Poll a database group and store the status of its flows in the status cache"""
+    if not app.state.coordinator.is_leader:
+        # Followers never query, the cache holds what the leader last sent
+        return {}
     
-    refresh_interval = flow.get("refresh_interval", 120)
-    aws_mappings = flow.get("aws_mappings", {})
-    onprem_mappings = flow.get("onprem_mappings", {})
+    # One query per database for every flow in the group
+    group_status = await app.state.poll_scheduler.poll_group(group_key, on_partial)
     
-    while True:
-        try:
-            # Get database connections for this flow
-            config = app.state.config_service.load_config(f"{flow_name.lower()}.json")
-            if not config:
-                logging.error(f"Config for flow {flow_name} not found")
-                await asyncio.sleep(refresh_interval)
-                continue
-                
-            aws_connector = await app.state.status_service.get_aws_connector(
-                config["databases"]["aws"]["host"],
-                config["databases"]["aws"]["user"],
-                config["databases"]["aws"]["password"],
-                config["databases"]["aws"]["database"]
-            )
-            
-            oracle_connector = await app.state.status_service.get_oracle_connector(
-                config["databases"]["oracle"]["host"],
-                config["databases"]["oracle"]["user"],
-                config["databases"]["oracle"]["password"],
-                config["databases"]["oracle"]["service"]
-            )
-            
-            # Get status updates
-            status = await app.state.status_service.get_flow_status(
-                aws_connector, oracle_connector, aws_mappings, onprem_mappings
+    timestamp = datetime.now()
+    for flow_name, status in group_status.items():
+        app.state.status_cache.put(flow_name, status, timestamp)
+    return group_status
+
+async def publish_status(group_status: Dict[str, Dict], partial: bool = False, timestamp: Optional[datetime] = None):
+    """Broadcast only the changed stages of each flow"""
+    timestamp = timestamp or datetime.now()
+    if app.state.coordinator.is_leader:
+        app.state.coordinator.publish({
+            "type": "status", "flows": group_status, "partial": partial, "timestamp": timestamp
+        })
+    for flow_name, status in group_status.items():
+        delta = app.state.delta_service.update(flow_name, status, timestamp, partial)
+        if delta:
+            app.state.history_service.record(flow_name, delta["stages"], timestamp)
+            started = time.perf_counter()
+            await manager.broadcast(delta, flow_name)
+            BROADCAST_SECONDS.observe(time.perf_counter() - started, flow=flow_name)
+        
+        # Re-estimate completion once all sources are in
+        graph = app.state.flow_service.get_graph(flow_name)
+        if not partial and graph:
+            changed = app.state.delta_service.changed_since(flow_name, app.state.eta_service.get_version(flow_name))
+            app.state.eta_service.update(
+                flow_name, graph, status, changed, timestamp,
+                app.state.delta_service.get_version(flow_name)
             )
+
+async def publish_partial_status(source: str, group_status: Dict[str, Dict]):
+    """Publish one source's stages without waiting for the slower sources"""
+    await publish_status(group_status, partial=True)
+
+async def status_updater(group_key: str):
+    scheduler = app.state.poll_scheduler
+    loop = asyncio.get_running_loop()
+    
+    # Fixed-rate deadlines, so the time spent polling doesn't stretch the period
+    deadline = loop.time()
+    while scheduler.get_group(group_key):
+        group_status = {}
+        started = loop.time()
+        error = None
+        try:
+            group_status = await refresh_group(group_key, publish_partial_status)
             
-            # Broadcast status update
-            update = StatusUpdate(
-                timestamp=datetime.now(),
-                flowName=flow_name,
-                stages=status
-            )
-            await manager.broadcast(json.dumps(update.dict(), default=str), flow_name)
+            # Full update drops stages that are no longer mapped
+            await publish_status(group_status)
             
         except Exception as e:
-            logging.error(f"Error in status updater for {flow_name}: {e}")
-            
-        await asyncio.sleep(refresh_interval)
+            error = str(e)
+            logging.error(f"Error in status updater for group {group_key}: {e}")
+        app.state.poller_supervisor.record_run(group_key, loop.time() - started, error)
+        
+        group = scheduler.get_group(group_key)
+        if METRICS.enabled and group:
+            for flow_name in group["flows"]:
+                TICK_SECONDS.observe(loop.time() - started, flow=flow_name)
+                SCHEDULE_LAG_SECONDS.observe(started - deadline, flow=flow_name)
+        watched = bool(group) and any(is_watched(flow_name) for flow_name in group["flows"])
+        deadline += scheduler.next_interval(group_key, group_status, watched)
+        
+        # After an overrun start from now rather than polling back to back
+        deadline = max(deadline, loop.time())
+        if await scheduler.wait(group_key, deadline - loop.time()):
+            deadline = loop.time()
+    
+    logging.info(f"Poll group {group_key} has no flows left, stopping status updater")
+
+def response_encoder(request: Request):
+    """Encoder for the format asked for by the Accept header, None for FastAPI's default JSON"""
+    return negotiate_accept(request.headers.get("accept")) or ENCODERS.get("orjson")
+
+def encode_response(request: Request, payload: Dict, details: bool = False, headers: Optional[Dict[str, str]] = None):
+    """Encode a status payload in the format asked for by the Accept header"""
+    encoder = response_encoder(request)
+    if encoder is None:
+        return JSONResponse(jsonable_encoder(payload), headers=headers) if headers else payload
+    return Response(encoder.encode(payload, details), media_type=encoder.media_type, headers=headers)
+
+def etag_headers(etag: str) -> Dict[str, str]:
+    # no-cache: clients may store the body but must revalidate it every time
+    return {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 response if If-None-Match names the current ETag, else None"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    # GET uses the weak comparison, W/ prefixes are ignored
+    def opaque(tag: str) -> str:
+        return tag[2:] if tag.startswith("W/") else tag
+    tags = [tag.strip() for tag in header.split(",")]
+    if "*" in tags or opaque(etag) in (opaque(tag) for tag in tags):
+        return Response(status_code=304, headers=etag_headers(etag))
+    return None
 
 # Endpoints
 @app.post("/api/configs/")
@@ -171,24 +431,10 @@ async def upload_config(file: UploadFile = File(...)):
         
         # Save config
         filename = f"{config['flowName'].lower()}.json"
+        previous = await app.state.config_service.load_config(filename)
         await app.state.config_service.save_config(filename, config)
         
-        # Parse flow definition
-        parser = FlowParser(config["flowDefinition"]["overall"], config["flowDefinition"]["subStages"])
-        parsed_flow = parser.parse()
-        
-        # Add to flow service
-        app.state.flow_service.add_flow(
-            config["flowName"],
-            parsed_flow,
-            config["stageMappings"]["aws"],
-            config["stageMappings"]["onPrem"],
-            config["refreshInterval"]
-        )
-        
-        # Start background task for status updates
-        background_tasks = BackgroundTasks()
-        background_tasks.add_task(status_updater, config["flowName"])
+        load_flow(config, previous)
         
         return {"status": "success", "message": f"Flow {config['flowName']} created"}
     except Exception as e:
@@ -196,74 +442,391 @@ async def upload_config(file: UploadFile = File(...)):
 
 @app.get("/api/configs/")
 async def list_configs():
-    configs = app.state.config_service.list_configs()
+    configs = await app.state.config_service.list_configs()
     return {"configs": configs}
 
 @app.get("/api/configs/{name}")
-async def get_config(name: str):
-    config = app.state.config_service.load_config(name)
+async def get_config(request: Request, name: str):
+    config = await app.state.config_service.load_config(name)
     if not config:
         raise HTTPException(status_code=404, detail=f"Config {name} not found")
-    return config
+    
+    etag = app.state.config_service.get_etag(name)
+    return not_modified(request, etag) or JSONResponse(config, headers=etag_headers(etag))
 
 @app.get("/api/flows/")
 async def list_flows():
     return app.state.flow_service.list_flows()
 
 @app.get("/api/flows/{name}")
-async def get_flow(name: str):
+async def get_flow(request: Request, name: str):
     flow = app.state.flow_service.get_flow(name)
     if not flow:
         raise HTTPException(status_code=404, detail=f"Flow {name} not found")
-    return flow
+    
+    etag = app.state.flow_service.get_etag(name)
+    return not_modified(request, etag) or JSONResponse(jsonable_encoder(flow), headers=etag_headers(etag))
+
+@app.get("/api/flows/{name}/stages/{stage}/tasks")
+async def get_stage_tasks(
+    request: Request,
+    name: str,
+    stage: str,
+    after: Optional[str] = None,
+    limit: Optional[int] = None
+):
+    """
+    Tasks of the latest run of a stage, fetched only when a stage is expanded
+    
+    Pages are ordered by task id; pass the returned "next" as after to get the
+    following page.
+    """
+    limit = min(max(limit or settings.task_page_size, 1), settings.task_max_page_size)
+    group_key = app.state.poll_scheduler.flow_groups.get(name)
+    if not group_key:
+        raise HTTPException(status_code=404, detail=f"Flow {name} not found")
+    
+    group = app.state.poll_scheduler.get_group(group_key)
+    source_name = next(
+        (source_name for source_name, mappings in group["flows"][name]["mappings"].items() if stage in mappings),
+        None
+    )
+    if source_name is None:
+        raise HTTPException(status_code=404, detail=f"Stage {stage} is not mapped in flow {name}")
+    
+    snapshot = await app.state.status_cache.get_or_fetch(name, lambda: refresh_group(group_key), key=group_key)
+    stage_status = snapshot and snapshot["status"].get(stage)
+    if not stage_status:
+        raise HTTPException(status_code=503, detail=f"Status for stage {stage} is not available")
+    
+    source_config = group["sources"][source_name]
+    status_service = app.state.status_service
+    timeout = source_config["timeout"] or status_service.timeouts.get(source_config["type"], status_service.default_timeout)
+    try:
+        source = await asyncio.wait_for(
+            status_service.get_source(source_config["type"], source_config["params"], source_config["pool"]),
+            timeout
+        )
+        run_key = source.run_key(stage_status.get("details") or {})
+        if run_key is None:
+            raise HTTPException(status_code=404, detail=f"No run with task details for stage {stage}")
+
+        page = await asyncio.wait_for(
+            app.state.task_service.get_tasks(
+                source,
+                group["flows"][name]["mappings"][source_name][stage],
+                run_key,
+                stage_status["status"],
+                after,
+                limit
+            ),
+            timeout
+        )
+    except NotImplementedError:
+        raise HTTPException(status_code=400, detail=f"Source {source_name} has no task details")
+    except asyncio.TimeoutError:
+        logging.error(f"Task query for {name}/{stage} timed out after {timeout}s")
+        raise HTTPException(status_code=503, detail=f"Task query for stage {stage} timed out")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error fetching tasks for {name}/{stage}: {e}")
+        raise HTTPException(status_code=503, detail=f"Tasks for stage {stage} are not available")
+    
+    return encode_response(request, {
+        "flow_name": name,
+        "stage": stage,
+        "run": {"key": run_key, "status": stage_status["status"]},
+        **page
+    })
+
+@app.get("/api/status")
+async def get_bulk_status(
+    request: Request,
+    flows: str = "all",
+    detail: str = "summary",
+    max_age: Optional[float] = None,
+    details: bool = False
+):
+    """
+    Status of several flows at once, flows is a comma-separated list or "all"
+    
+    Each database group is refreshed at most once, so a cold cache costs one
+    query per source of every group involved. detail=full adds per-stage status.
+    """
+    if detail not in ("summary", "full"):
+        raise HTTPException(status_code=400, detail="detail must be summary or full")
+    
+    flow_groups = app.state.poll_scheduler.flow_groups
+    if flows == "all":
+        names = list(flow_groups)
+    else:
+        names = [name.strip() for name in flows.split(",") if name.strip()]
+    
+    known = [name for name in names if name in flow_groups]
+    snapshots = await asyncio.gather(*(
+        app.state.status_cache.get_or_fetch(
+            flow_name,
+            # Bind the group now, the lambda runs later
+            lambda group_key=flow_groups[flow_name]: refresh_group(group_key),
+            key=flow_groups[flow_name],
+            max_age=max_age
+        )
+        for flow_name in known
+    ), return_exceptions=True)
+    
+    result = {}
+    for flow_name, snapshot in zip(known, snapshots):
+        if isinstance(snapshot, Exception) or not snapshot:
+            result[flow_name] = {"error": str(snapshot) if snapshot else "Status not available"}
+            continue
+        
+        summary = {
+            "as_of": snapshot["as_of"],
+            "age": round(snapshot["age"], 3),
+            **app.state.status_service.summarize(snapshot["status"]),
+            "last_transition": app.state.history_service.last_transition(flow_name)
+        }
+        if detail == "full":
+            summary["status"] = snapshot["status"]
+        result[flow_name] = summary
+    
+    return encode_response(request, {
+        "timestamp": datetime.now(),
+        "flows": result,
+        "missing": [name for name in names if name not in flow_groups]
+    }, details)
 
 @app.get("/api/status/{flow_name}")
-async def get_status(flow_name: str):
+async def get_status(request: Request, flow_name: str, max_age: Optional[float] = None, details: bool = False):
     flow = app.state.flow_service.get_flow(flow_name)
     if not flow:
         raise HTTPException(status_code=404, detail=f"Flow {flow_name} not found")
     
-    # Get database connections for this flow
-    config = app.state.config_service.load_config(f"{flow_name.lower()}.json")
-    if not config:
+    group_key = app.state.poll_scheduler.flow_groups.get(flow_name)
+    if not group_key:
         raise HTTPException(status_code=404, detail=f"Config for flow {flow_name} not found")
-        
-    aws_connector = await app.state.status_service.get_aws_connector(
-        config["databases"]["aws"]["host"],
-        config["databases"]["aws"]["user"],
-        config["databases"]["aws"]["password"],
-        config["databases"]["aws"]["database"]
-    )
     
-    oracle_connector = await app.state.status_service.get_oracle_connector(
-        config["databases"]["oracle"]["host"],
-        config["databases"]["oracle"]["user"],
-        config["databases"]["oracle"]["password"],
-        config["databases"]["oracle"]["service"]
+    # Serve the poller's snapshot, concurrent misses share one refresh of the group
+    snapshot = await app.state.status_cache.get_or_fetch(
+        flow_name,
+        lambda: refresh_group(group_key),
+        key=group_key,
+        max_age=max_age
     )
+    if not snapshot:
+        raise HTTPException(status_code=503, detail=f"Status for flow {flow_name} is not available")
     
-    aws_mappings = flow.get("aws_mappings", {})
-    onprem_mappings = flow.get("onprem_mappings", {})
+    # Weak: the version only moves when the status does, so as_of and age can differ under one tag
+    encoder = response_encoder(request)
+    representation = (encoder.name if encoder else "json") + ("-details" if details else "")
+    etag = f'W/"{app.state.status_cache.epoch}-{snapshot["version"]}-{representation}"'
+    response = not_modified(request, etag)
+    if response:
+        return response
     
-    status = await app.state.status_service.get_flow_status(
-        aws_connector, oracle_connector, aws_mappings, onprem_mappings
+    return encode_response(request, {
+        "flow_name": flow_name,
+        "timestamp": snapshot["as_of"],
+        "as_of": snapshot["as_of"],
+        "age": round(snapshot["age"], 3),
+        "status": snapshot["status"]
+    }, details, etag_headers(etag))
+
+@app.get("/api/status/{flow_name}/eta")
+async def get_eta(flow_name: str):
+    estimate = app.state.eta_service.get_estimate(flow_name)
+    if not estimate:
+        raise HTTPException(status_code=404, detail=f"No estimate for flow {flow_name} yet")
+    return estimate
+
+@app.get("/api/history/{flow_name}")
+async def get_history(
+    flow_name: str,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    stage: Optional[str] = None
+):
+    """Stage transitions of a flow as newline-delimited JSON, oldest first"""
+    if not app.state.flow_service.get_flow(flow_name):
+        raise HTTPException(status_code=404, detail=f"Flow {flow_name} not found")
+    
+    async def stream():
+        async for transition in app.state.history_service.query(flow_name, start, end, stage):
+            yield json.dumps(transition, default=str) + "\n"
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/admin/sources")
+async def source_stats():
+    return app.state.status_service.source_stats
+
+@app.get("/api/admin/sources/health")
+async def source_health():
+    return await app.state.status_service.health()
+
+@app.get("/api/admin/pools")
+async def pool_stats():
+    return app.state.status_service.pool_stats()
+
+@app.get("/api/admin/pollers")
+async def poller_stats():
+    return app.state.poller_supervisor.get_stats()
+
+@app.get("/api/admin/coordination")
+async def coordination_stats():
+    return app.state.coordinator.get_stats()
+
+@app.get("/api/admin/loop")
+async def loop_stats():
+    return app.state.loop_monitor.get_stats()
+
+@app.get("/api/admin/connections")
+async def connection_stats():
+    return manager.get_stats()
+
+@app.get("/api/events/{flow_name}")
+async def event_stream(request: Request, flow_name: str, format: str = "json", details: bool = False):
+    """
+    Server-Sent Events with the same snapshot and delta messages as /ws/{flow_name}
+    
+    For clients that can't open a WebSocket. Each versioned event has an
+    "<epoch>:<version>" id; on reconnect the browser sends it back as
+    Last-Event-ID and the stream resumes with a delta instead of a snapshot.
+    A client that detects a version gap reconnects without it.
+    """
+    if not app.state.flow_service.get_graph(flow_name):
+        raise HTTPException(status_code=404, detail=f"Flow {flow_name} not found")
+    encoder = EVENT_STREAM_ENCODERS.get(format)
+    if encoder is None:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EVENT_STREAM_ENCODERS)}")
+    
+    stream = EventStream()
+    await manager.connect(stream, flow_name, encoder=encoder, details=details)
+    if len(manager.active_connections.get(flow_name, [])) == 1:
+        wake_flow(flow_name)
+    
+    epoch, _, version = (request.headers.get("last-event-id") or "").partition(":")
+    catch_up = app.state.delta_service.delta_since(
+        flow_name, int(version) if version.isdigit() else None, epoch or None
     )
+    if catch_up and (catch_up["type"] == "snapshot" or catch_up["stages"] or catch_up["removed"]):
+        await manager.send(stream, catch_up, flow_name)
     
-    return {
-        "flow_name": flow_name,
-        "timestamp": datetime.now(),
-        "status": status
-    }
+    async def events():
+        try:
+            yield f"retry: {int(settings.sse_retry * 1000)}\n\n"
+            async for event in stream.events(settings.ws_heartbeat_interval):
+                yield event
+        finally:
+            manager.disconnect(stream)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Stop reverse proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.websocket("/ws/{flow_name}")
-async def websocket_endpoint(websocket: WebSocket, flow_name: str):
-    await manager.connect(websocket, flow_name)
+async def websocket_endpoint(websocket: WebSocket, flow_name: str, details: bool = False):
+    subprotocol, encoder = negotiate_subprotocol(websocket.scope.get("subprotocols", []))
+    await manager.connect(websocket, flow_name, encoder=encoder, subprotocol=subprotocol, details=details)
+    
+    # First subscriber of a backed-off flow, poll it now
+    if len(manager.active_connections.get(flow_name, [])) == 1:
+        wake_flow(flow_name)
+    try:
+        # Start the client from a full snapshot, deltas follow
+        snapshot = app.state.delta_service.snapshot(flow_name)
+        if snapshot:
+            await manager.send(websocket, snapshot, flow_name)
+        
+        while True:
+            data = await websocket.receive_text()
+            try:
+                message = json.loads(data)
+            except ValueError:
+                continue
+            
+            # Client missed a version, send the full state again
+            if isinstance(message, dict) and message.get("type") == "resync":
+                snapshot = app.state.delta_service.snapshot(flow_name)
+                if snapshot:
+                    await manager.send(websocket, snapshot, flow_name)
+    except WebSocketDisconnect:
+        manager.disconnect(websocket)
+
+@app.websocket("/ws")
+async def multiplexed_websocket_endpoint(websocket: WebSocket, details: bool = False):
+    """
+    One socket for any number of flows
+    
+    Client messages:
+        {"type": "subscribe", "flows": ["A", {"flowName": "B", "version": 12, "epoch": "..."}]}
+        {"type": "unsubscribe", "flows": ["A"]}
+        {"type": "resync", "flowName": "A"}
+        {"type": "pong"}
+    
+    A subscription carrying the version and epoch of the last message the client
+    applied resumes with a delta from that version, otherwise it starts from a
+    snapshot. Server messages carry their flowName; pings must be answered.
+    
+    The wire format is picked from the requested subprotocols (status.json,
+    status.orjson, status.compact, status.msgpack), JSON by default.
+    """
+    subprotocol, encoder = negotiate_subprotocol(websocket.scope.get("subprotocols", []))
+    await manager.connect(websocket, heartbeat=True, encoder=encoder, subprotocol=subprotocol, details=details)
     try:
         while True:
             data = await websocket.receive_text()
-            # Handle any client messages if needed
+            manager.touch(websocket)
+            try:
+                message = json.loads(data)
+            except ValueError:
+                continue
+            if not isinstance(message, dict):
+                continue
+            
+            message_type = message.get("type")
+            if message_type == "subscribe":
+                for entry in message.get("flows", []):
+                    if isinstance(entry, str):
+                        entry = {"flowName": entry}
+                    flow_name = entry.get("flowName")
+                    if not app.state.flow_service.get_graph(flow_name):
+                        await manager.send(websocket, {
+                            "type": "error",
+                            "flowName": flow_name,
+                            "detail": f"Flow {flow_name} not found"
+                        })
+                        continue
+                    
+                    manager.subscribe(websocket, flow_name)
+                    
+                    # First subscriber of a backed-off flow, poll it now
+                    if len(manager.active_connections.get(flow_name, [])) == 1:
+                        wake_flow(flow_name)
+                    catch_up = app.state.delta_service.delta_since(flow_name, entry.get("version"), entry.get("epoch"))
+                    if catch_up and (catch_up["type"] == "snapshot" or catch_up["stages"] or catch_up["removed"]):
+                        await manager.send(websocket, catch_up, flow_name)
+            
+            elif message_type == "unsubscribe":
+                for flow_name in message.get("flows", []):
+                    manager.unsubscribe(websocket, flow_name)
+            
+            elif message_type == "resync":
+                flow_name = message.get("flowName")
+                snapshot = app.state.delta_service.snapshot(flow_name)
+                channel = manager.channels.get(websocket)  # None once evicted as a slow consumer
+                if snapshot and channel and flow_name in channel.flows:
+                    await manager.send(websocket, snapshot, flow_name)
     except WebSocketDisconnect:
-        manager.disconnect(websocket, flow_name)
+        manager.disconnect(websocket)
 
 # Mount the static files
 app.mount("/", StaticFiles(directory="frontend/build", html=True), name="frontend")
@@ -0,0 +1,482 @@
+# benchmarks/run_benchmarks.py
+"""
+Offline benchmarks of the status pipeline, reported as JSON
+
+Usage:
+    python backend/benchmarks/run_benchmarks.py [--quick] [--output results.json]
+
+Needs no database: the real AWSConnector and OracleConnector run against
+in-memory SQLite databases seeded with synthetic dag_run and stage_status
+rows, through stand-in pools whose cursors translate the MySQL and Oracle
+SQL, with optional per-query latency to stand in for a remote host. Cases:
+
+    parse      FlowParser.parse on generated flows (cold, and memoized)
+    status     StatusService.get_flow_status end to end: the Airflow dag_run
+               query (full, first incremental poll, steady incremental polls)
+               and the batched Oracle tuple IN-list query
+    broadcast  ConnectionManager.broadcast to N fake WebSocket clients
+    encoding   Encoded size and encode time of snapshots per wire format
+
+Every result has the case name, its parameters and timings in milliseconds,
+so runs can be diffed to catch regressions.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path[:0] = [
+    os.path.join(os.path.dirname(__file__), ".."),
+    os.path.join(os.path.dirname(__file__), "..", "database")
+]
+
+import models.flow_parser as flow_parser
+from models.flow_parser import FlowParser
+from services.status_service import StatusService
+from services.connection_manager import ConnectionManager
+from services.status_encoder import ENCODERS
+from database.aws_connector import AWSConnector
+from database.oracle_connector import OracleConnector
+
+STATUSES = ["completed", "running", "pending", "failed"]
+
+def generate_flow(stage_count: int, stages_per_category: int = 10, seed: int = 0):
+    """
+    Flow definition with stage_count stages
+
+    Each category runs a stage, a parallel pair and a sequence of the rest;
+    every third stage has sub-stages.
+
+    Returns:
+        Tuple of (overall, subStages, stage names)
+    """
+    rng = random.Random(seed)
+    categories = []
+    sub_stages = {}
+    names = []
+    for category_index in range(0, stage_count, stages_per_category):
+        category = f"Category_{category_index // stages_per_category}"
+        stages = [
+            f"Stage_{index}"
+            for index in range(category_index, min(category_index + stages_per_category, stage_count))
+        ]
+        names.extend(stages)
+
+        if len(stages) >= 3:
+            expression = f"{stages[0]} -> ({stages[1]}, {stages[2]})"
+            if stages[3:]:
+                expression += " -> " + " -> ".join(stages[3:])
+        else:
+            expression = " -> ".join(stages)
+        categories.append(f"{category}{{{expression}}}")
+
+        for stage in stages[::3]:
+            width = rng.randint(1, 3)
+            sub_stages.setdefault(category, {})[stage] = (
+                f"{stage}_a -> (" + ", ".join(f"{stage}_p{index}" for index in range(width)) + f") -> {stage}_z"
+            )
+
+    return " -> ".join(categories), sub_stages, names
+
+def seed_dag_runs(conn: sqlite3.Connection, dag_ids, runs_per_dag: int, seed: int = 0):
+    """Airflow dag_run table with runs_per_dag daily runs per DAG, the latest may still be running"""
+    rng = random.Random(seed)
+    now = datetime(2026, 1, 1, 6, 0)
+    conn.execute(
+        "CREATE TABLE dag_run (id INTEGER PRIMARY KEY, dag_id TEXT, run_id TEXT, state TEXT,"
+        " execution_date TEXT, start_date TEXT, end_date TEXT)"
+    )
+    conn.execute("CREATE INDEX dag_run_dag ON dag_run (dag_id, execution_date)")
+    rows = []
+    for day in range(runs_per_dag):
+        for dag_id in dag_ids:
+            execution_date = now - timedelta(days=runs_per_dag - 1 - day)
+            latest = day == runs_per_dag - 1
+            state = rng.choice(["success", "running", "queued", "failed"]) if latest else "success"
+            start = execution_date + timedelta(seconds=rng.randint(0, 3600))
+            end = start + timedelta(seconds=rng.randint(60, 900)) if state in ("success", "failed") else None
+            rows.append((
+                dag_id, f"scheduled__{execution_date.isoformat()}", state,
+                execution_date.isoformat(), start.isoformat(), end.isoformat() if end else None
+            ))
+    conn.executemany(
+        "INSERT INTO dag_run (dag_id, run_id, state, execution_date, start_date, end_date) VALUES (?, ?, ?, ?, ?, ?)",
+        rows
+    )
+
+def seed_stage_status(conn: sqlite3.Connection, pairs, seed: int = 0):
+    """On-prem stage_status table with one row per (bpf_id, process_id)"""
+    rng = random.Random(seed)
+    now = datetime(2026, 1, 1, 6, 0)
+    conn.execute("CREATE TABLE stage_status (bpf_id INTEGER, process_id INTEGER, status TEXT, start_date TEXT, end_date TEXT)")
+    conn.execute("CREATE INDEX stage_status_pair ON stage_status (bpf_id, process_id)")
+    rows = []
+    for bpf_id, process_id in pairs:
+        status = rng.choice(["Completed", "Running", "Not_started", "Failed"])
+        start = now + timedelta(seconds=rng.randint(0, 3600))
+        end = start + timedelta(seconds=rng.randint(60, 900)) if status in ("Completed", "Failed") else None
+        rows.append((bpf_id, process_id, status, start.isoformat(), end.isoformat() if end else None))
+    conn.executemany("INSERT INTO stage_status VALUES (?, ?, ?, ?, ?)", rows)
+
+class SQLiteCursor:
+    """
+    Runs the connectors' SQL on SQLite
+
+    MySQL %s and Oracle :name binds map to SQLite's, schema prefixes are
+    dropped and Oracle's tuple IN-list becomes IN (VALUES ...). Counts
+    queries and sleeps latency seconds per query like a remote round trip.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, counter: dict, latency: float, as_dict: bool):
+        self.conn = conn
+        self.counter = counter
+        self.latency = latency
+        self.as_dict = as_dict
+        self.rows = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def execute(self, query: str, params=None):
+        query = re.sub(r"\b(schema1|on_prem_schema1)\.", "", query).replace("%s", "?")
+        query = query.replace(") IN ((", ") IN (VALUES (")
+        if isinstance(params, list):
+            params = [value.isoformat() if isinstance(value, datetime) else value for value in params]
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        cursor = self.conn.execute(query, params or [])
+        columns = [column[0] for column in cursor.description]
+        self.rows = [dict(zip(columns, row)) if self.as_dict else row for row in cursor.fetchall()]
+        self.counter["queries"] += 1
+
+    async def fetchall(self):
+        return self.rows
+
+    async def close(self):
+        pass
+
+class SQLiteConnection:
+    def __init__(self, conn: sqlite3.Connection, counter: dict, latency: float):
+        self.conn = conn
+        self.counter = counter
+        self.latency = latency
+
+    def cursor(self, cursor_class=None):
+        # aiomysql asks for a DictCursor, oracledb cursors return tuples
+        return SQLiteCursor(self.conn, self.counter, self.latency, as_dict=cursor_class is not None)
+
+class SQLitePool:
+    """Stands in for an aiomysql pool (release is sync)"""
+
+    size = opened = 1
+
+    def __init__(self, conn: sqlite3.Connection, latency: float):
+        self.counter = {"queries": 0}
+        self.connection = SQLiteConnection(conn, self.counter, latency)
+
+    async def acquire(self):
+        return self.connection
+
+    def release(self, connection):
+        pass
+
+class AsyncReleaseSQLitePool(SQLitePool):
+    """Stands in for an oracledb pool (release is awaited)"""
+
+    async def release(self, connection):
+        pass
+
+def attach_pool(source, pool):
+    """Point a connector at a stand-in pool so connect() is skipped"""
+    source.pool = pool
+    source.pool_options = {**source.pool_options, "pre_ping": False}
+    source.source_key = f"{source.type_name}:bench"
+    return source
+
+def summarize(name: str, params: dict, samples_ms: list, **extra) -> dict:
+    ordered = sorted(samples_ms)
+    return {
+        "name": name,
+        "params": params,
+        "repeat": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 4),
+        "p50_ms": round(ordered[len(ordered) // 2], 4),
+        "p95_ms": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)], 4),
+        "min_ms": round(ordered[0], 4),
+        "max_ms": round(ordered[-1], 4),
+        **extra
+    }
+
+def bench_parse(sizes, repeat: int) -> list:
+    results = []
+    for size in sizes:
+        overall, sub_stages, _ = generate_flow(size)
+        runs = max(1, repeat if size <= 1000 else repeat // 10)
+
+        cold = []
+        for _ in range(runs):
+            flow_parser._PARSE_CACHE.clear()
+            started = time.perf_counter()
+            FlowParser(overall, sub_stages).parse()
+            cold.append((time.perf_counter() - started) * 1000)
+        results.append(summarize("parse", {"stages": size, "cache": "cold"}, cold))
+
+        warm = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            FlowParser(overall, sub_stages).parse()
+            warm.append((time.perf_counter() - started) * 1000)
+        results.append(summarize("parse", {"stages": size, "cache": "memoized"}, warm))
+    return results
+
+async def bench_status(sizes, repeat: int, latency: float, runs_per_dag: int) -> list:
+    results = []
+    for size in sizes:
+        # Half the stages on each source, like AWS and on-prem
+        names = [f"Stage_{index}" for index in range(size)]
+        aws_mappings = {name: f"dag_{name}" for name in names[::2]}
+        onprem_mappings = {
+            name: {"bpf_id": 20000 + index, "process_id": 10} for index, name in enumerate(names[1::2])
+        }
+
+        airflow_db = sqlite3.connect(":memory:")
+        seed_dag_runs(airflow_db, aws_mappings.values(), runs_per_dag)
+        oracle_db = sqlite3.connect(":memory:")
+        seed_stage_status(oracle_db, [(mapping["bpf_id"], mapping["process_id"]) for mapping in onprem_mappings.values()])
+
+        service = StatusService()
+        for mode in ("full", "incremental"):
+            aws_pool = SQLitePool(airflow_db, latency)
+            oracle_pool = AsyncReleaseSQLitePool(oracle_db, latency)
+            sources = {
+                "aws": attach_pool(AWSConnector("bench", "bench", "", "airflow", incremental=mode == "incremental"), aws_pool),
+                "onPrem": attach_pool(OracleConnector("bench", "bench", "", "bench"), oracle_pool)
+            }
+            mappings = {"aws": aws_mappings, "onPrem": onprem_mappings}
+            params = {"stages": size, "runs_per_dag": runs_per_dag, "latency_ms": latency * 1000}
+
+            # The first incremental poll is a full resync, report it separately
+            if mode == "incremental":
+                started = time.perf_counter()
+                status = await service.get_flow_status(sources, mappings)
+                results.append(summarize(
+                    "status", {**params, "airflow": "incremental-first"}, [(time.perf_counter() - started) * 1000],
+                    airflow_queries=aws_pool.counter["queries"], oracle_queries=oracle_pool.counter["queries"]
+                ))
+                aws_pool.counter["queries"] = oracle_pool.counter["queries"] = 0
+
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                status = await service.get_flow_status(sources, mappings)
+                samples.append((time.perf_counter() - started) * 1000)
+            assert len(status) == size
+            assert not any(stage["status"] in ("error", "not_found") for stage in status.values())
+
+            results.append(summarize(
+                "status", {**params, "airflow": mode}, samples,
+                airflow_queries_per_poll=aws_pool.counter["queries"] / repeat,
+                oracle_queries_per_poll=oracle_pool.counter["queries"] / repeat
+            ))
+        airflow_db.close()
+        oracle_db.close()
+    return results
+
+class FakeWebSocket:
+    """Accepts everything and counts what it is sent"""
+
+    def __init__(self, delivered: asyncio.Event, counter: dict, target: int):
+        self.delivered = delivered
+        self.counter = counter
+        self.target = target
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, message: str):
+        self.counter["messages"] += 1
+        self.counter["bytes"] += len(message)
+        if self.counter["messages"] >= self.target:
+            self.delivered.set()
+
+    async def send_bytes(self, message: bytes):
+        await self.send_text(message)
+
+    async def close(self, code: int = 1000):
+        pass
+
+async def bench_broadcast(client_counts, messages: int, stage_count: int) -> list:
+    results = []
+    delta = {
+        "type": "delta",
+        "flowName": "BENCH",
+        "epoch": "0123abcd",
+        "version": 2,
+        "baseVersion": 1,
+        "timestamp": datetime(2026, 1, 1, 6, 0),
+        "stages": {
+            f"Stage_{index}": {"status": "running", "start_time": datetime(2026, 1, 1, 6, 0), "end_time": None, "details": {}}
+            for index in range(stage_count)
+        },
+        "removed": []
+    }
+
+    for clients in client_counts:
+        delivered = asyncio.Event()
+        counter = {"messages": 0, "bytes": 0}
+        manager = ConnectionManager(max_queue=messages)
+        sockets = [FakeWebSocket(delivered, counter, clients * messages) for _ in range(clients)]
+        for websocket in sockets:
+            await manager.connect(websocket, "BENCH")
+
+        broadcast_ms = []
+        started = time.perf_counter()
+        for _ in range(messages):
+            call_started = time.perf_counter()
+            await manager.broadcast(delta, "BENCH")
+            broadcast_ms.append((time.perf_counter() - call_started) * 1000)
+        await asyncio.wait_for(delivered.wait(), timeout=60)
+        elapsed = time.perf_counter() - started
+
+        dropped = sum(stats["dropped"] for stats in manager.get_stats().values())
+        results.append(summarize(
+            "broadcast",
+            {"clients": clients, "messages": messages, "stages": stage_count},
+            broadcast_ms,
+            delivered=counter["messages"],
+            dropped=dropped,
+            deliveries_per_second=round(counter["messages"] / elapsed, 1),
+            drain_ms=round(elapsed * 1000, 4)
+        ))
+        for websocket in sockets:
+            manager.disconnect(websocket)
+    return results
+
+def make_snapshot(stage_count: int) -> dict:
+    """A snapshot message of stage_count stages, half AWS and half Oracle rows in details"""
+    now = datetime(2026, 1, 1, 6, 0)
+    stages = {}
+    for index in range(stage_count):
+        status = STATUSES[index % len(STATUSES)]
+        start = now + timedelta(minutes=index)
+        end = start + timedelta(minutes=7) if status in ("completed", "failed") else None
+        if index % 2:
+            details = {
+                "bpf_id": 1000 + index,
+                "process_id": 2000 + index,
+                "status": status.upper(),
+                "start_date": start,
+                "end_date": end
+            }
+        else:
+            details = {
+                "dag_id": f"deriv_stage_{index}_dag",
+                "state": "success" if status == "completed" else status,
+                "start_date": start,
+                "end_date": end,
+                "execution_date": start
+            }
+        stages[f"Stage_{index}"] = {
+            "status": status,
+            "start_time": start,
+            "end_time": end,
+            "details": details
+        }
+
+    return {
+        "type": "snapshot",
+        "flowName": "BENCH",
+        "epoch": "0123abcd",
+        "version": 42,
+        "timestamp": now,
+        "stages": stages,
+        "stageVersions": {name: 42 for name in stages}
+    }
+
+def bench_encoding(sizes, repeat: int) -> list:
+    results = []
+    for size in sizes:
+        message = make_snapshot(size)
+        baseline = None
+        for encoder in ENCODERS.values():
+            for details in ([False, True] if encoder.compact else [True]):
+                encoded = encoder.encode(message, details)
+                encoded_bytes = len(encoded.encode() if isinstance(encoded, str) else encoded)
+                samples = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    encoder.encode(message, details)
+                    samples.append((time.perf_counter() - started) * 1000)
+                if baseline is None:
+                    baseline = encoded_bytes
+                results.append(summarize(
+                    "encoding", {"stages": size, "format": encoder.name, "details": details}, samples,
+                    bytes=encoded_bytes,
+                    size_vs_json=round(encoded_bytes / baseline, 3)
+                ))
+    return results
+
+async def run(args) -> dict:
+    results = []
+    if "parse" in args.cases:
+        results.extend(bench_parse(args.parse_sizes, args.repeat))
+    if "status" in args.cases:
+        results.extend(await bench_status(args.status_sizes, args.repeat, args.latency, args.runs_per_dag))
+    if "broadcast" in args.cases:
+        results.extend(await bench_broadcast(args.clients, args.messages, args.broadcast_stages))
+    if "encoding" in args.cases:
+        results.extend(bench_encoding(args.encoding_sizes, args.repeat))
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    cases = ["parse", "status", "broadcast", "encoding"]
+    parser.add_argument("--cases", nargs="+", default=cases, choices=cases)
+    parser.add_argument("--parse-sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--status-sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every query")
+    parser.add_argument("--runs-per-dag", type=int, default=30, help="dag_run history rows per DAG")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--messages", type=int, default=20, help="messages broadcast per client count")
+    parser.add_argument("--broadcast-stages", type=int, default=20, help="changed stages per broadcast delta")
+    parser.add_argument("--encoding-sizes", type=int, nargs="+", default=[20, 100, 500])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--quick", action="store_true", help="small sizes and few repeats, for CI")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.parse_sizes = [10, 100]
+        args.status_sizes = [10, 100]
+        args.clients = [1, 10]
+        args.encoding_sizes = [20]
+        args.runs_per_dag = 5
+        args.repeat = 3
+
+    report = asyncio.run(run(args))
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(encoded + "\n")
+    else:
+        print(encoded)
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,72 @@
 from pydantic import BaseSettings
 from functools import lru_cache
 import os
-from typing import Dict, Any
 
 class Settings(BaseSettings):
     # General settings
     app_name: str = "DERIV Flow Tracker"
     debug: bool = True
     status_update_interval: int = 120  # seconds
+    aws_query_timeout: float = 30.0  # seconds
+    oracle_query_timeout: float = 30.0  # seconds
+    status_cache_ttl: float = 30.0  # seconds a cached status is served by GET /api/status
+    
+    # Adaptive polling, the refreshInterval of a flow is its normal cadence
+    poll_active_interval: float = 10.0  # seconds while a watched flow has running stages
+    poll_idle_factor: float = 4.0  # Backoff when nothing is running, and again when unwatched
+    poll_max_interval: float = 900.0  # seconds
+    poll_jitter: float = 0.1  # Fraction of the interval randomly added or removed
+    poller_restart_backoff: float = 1.0  # seconds before restarting a crashed poller, doubling
+    poller_max_backoff: float = 60.0  # seconds
+    
+    # Completion estimates
+    eta_window: int = 50  # completed runs kept per stage
+    eta_default_duration: float = 300.0  # seconds assumed for stages without history
+    
+    # Task drill-down
+    task_page_size: int = 100  # Tasks per page unless the request asks for fewer
+    task_max_page_size: int = 1000
+    task_cache_runs: int = 256  # Runs whose task pages are cached
+    task_cache_pages: int = 32  # Pages cached per run, least recently used dropped first
+    task_running_ttl: float = 30.0  # seconds the tasks of an unfinished run are cached
+    
+    # Status history
+    history_path: str = "history.db"
+    history_retention_days: float = 30.0
+    history_flush_interval: float = 5.0  # seconds between batched writes
+    
+    # Connection pools, per database overrides go in the "pool" entry of a flow config
+    pool_min_size: int = 1
+    pool_max_size: int = 10
+    pool_acquire_timeout: float = 10.0  # seconds
+    pool_recycle: int = 3600  # seconds before an idle connection is replaced
+    pool_pre_ping: bool = True
+    pool_max_failures: int = 3  # consecutive failed polls before a pool is rebuilt
+    
+    # WebSocket fan-out
+    ws_queue_size: int = 8  # Outbound messages buffered per client
+    ws_send_timeout: float = 5.0  # seconds
+    ws_max_lag: int = 32  # Dropped messages in a row before a client is evicted
+    ws_heartbeat_interval: float = 15.0  # seconds between pings on the multiplexed socket
+    ws_heartbeat_timeout: float = 45.0  # seconds without a reply before a client is evicted
+    sse_retry: float = 3.0  # seconds an event stream client waits before reconnecting
+    
+    # Telemetry
+    metrics_enabled: bool = True  # Record metrics served at /metrics
+    
+    # Multiple workers, one leader polls and relays status to the others
+    coordination_enabled: bool = False
+    coordination_dir: str = ".coordination"  # Lock file and status bus socket, local to the host
+    coordination_interval: float = 2.0  # seconds between leader election attempts
+    
+    # Event loop
+    io_workers: int = 4  # Threads for blocking file and driver calls
+    loop_lag_interval: float = 0.5  # seconds between loop lag samples
+    loop_lag_threshold_ms: float = 100.0  # Lag logged as a blocked loop
     
     # Directories
     config_dir: str = "configs"
+    config_poll_interval: float = 5.0  # seconds between config directory checks
     
     # Secret key for token generation
     secret_key: str = os.environ.get("SECRET_KEY", "development_secret_key")
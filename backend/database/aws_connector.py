@@ -1,16 +1,48 @@
 # database/aws_connector.py
 import aiomysql
+import asyncio
 import logging
-from typing import Dict, List, Optional
+import time
+from typing import Dict, List, Optional, Any
 
-class AWSConnector:
-    def __init__(self, host: str, user: str, password: str, database: str):
+from database.status_source import StatusSource, register_source
+
+@register_source("airflow")
+class AWSConnector(StatusSource):
+    # Airflow DAG run and task instance states to our status
+    STATE_MAP = {
+        'success': 'completed',
+        'running': 'running',
+        'failed': 'failed',
+        'upstream_failed': 'failed',
+        'up_for_retry': 'running',
+        'queued': 'pending',
+        'scheduled': 'pending'
+    }
+    
+    def __init__(
+        self,
+        host: str,
+        user: str,
+        password: str,
+        database: str,
+        incremental: bool = True,
+        full_resync_interval: int = 600
+    ):
         self.host = host
         self.user = user
         self.password = password
         self.database = database
         self.pool = None
         
+        # Incremental mode state
+        self.incremental = incremental
+        self.full_resync_interval = full_resync_interval  # seconds
+        self.latest_runs = {}  # Mapping of dag_id to its latest dag_run row
+        self.high_water_marks = {}  # Mapping of dag_id to highest dag_run id seen
+        self.last_full_sync = None
+        self.refresh_lock = asyncio.Lock()  # Groups sharing this connector refresh one at a time
+        
     async def connect(self):
         if not self.pool:
             try:
@@ -19,7 +51,10 @@ class AWSConnector:
                     user=self.user,
                     password=self.password,
                     db=self.database,
-                    autocommit=True
+                    autocommit=True,
+                    minsize=self.pool_options["min_size"],
+                    maxsize=self.pool_options["max_size"],
+                    pool_recycle=self.pool_options["recycle"]
                 )
                 logging.info("Connected to AWS RDS database")
             except Exception as e:
@@ -30,43 +65,98 @@ class AWSConnector:
         if self.pool:
             self.pool.close()
             await self.pool.wait_closed()
+            self.pool = None
             logging.info("Closed connection to AWS RDS database")
     
-    async def get_dag_status(self, dag_ids: List[str]) -> Dict[str, Dict]:
-        """Get status information for specified DAGs"""
+    async def _acquire_connection(self):
+        return await self.pool.acquire()
+    
+    async def _release_connection(self, conn):
+        self.pool.release(conn)
+    
+    async def _ping_connection(self, conn):
+        await conn.ping(reconnect=True)
+    
+    def pool_size(self) -> Optional[int]:
+        return self.pool.size if self.pool else None
+    
+    async def ping(self):
+        if not self.pool:
+            await self.connect()
+        async with self.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("SELECT 1")
+                await cursor.fetchall()
+    
+    async def batch_fetch(self, keys: Dict[str, Any]) -> Dict[str, Dict]:
+        """Stage mappings are DAG ids, fetched with a single dag_run query"""
+        return await self.get_dag_status(list(keys), raise_errors=True)
+    
+    def map_status(self, stage_rows: Dict[str, Optional[Dict]]) -> Dict[str, Any]:
+        """Map DAG status rows to stage status"""
+        result = {}
+        for stage_name, row in stage_rows.items():
+            if row is not None:
+                dag_state = row.get('state', 'unknown')
+                
+                # Map Airflow state to our status
+                status = self.STATE_MAP.get(dag_state.lower(), dag_state.lower())
+                
+                result[stage_name] = {
+                    'status': status,
+                    'start_time': row.get('start_date'),
+                    'end_time': row.get('end_date'),
+                    'details': row
+                }
+            else:
+                result[stage_name] = {
+                    'status': 'unknown',
+                    'start_time': None,
+                    'end_time': None,
+                    'details': {}
+                }
+        return result
+    
+    async def get_dag_status(self, dag_ids: List[str], raise_errors: bool = False) -> Dict[str, Dict]:
+        """
+        Get status information for specified DAGs
+        
+        In incremental mode the latest run per DAG is kept in memory and only
+        dag_run rows newer than the per-DAG high-water mark, plus the current
+        rows of the tracked latest runs, are fetched. A full resync runs every
+        full_resync_interval seconds and for DAGs not seen before.
+        
+        Query errors mark every DAG as error, or are raised with raise_errors.
+        """
         if not self.pool:
             await self.connect()
             
         result = {}
         try:
-            async with self.pool.acquire() as conn:
+            async with self.acquire() as conn:
                 async with conn.cursor(aiomysql.DictCursor) as cursor:
-                    # Get the latest run for each DAG
-                    placeholders = ', '.join(['%s'] * len(dag_ids))
-                    query = f"""
-                    SELECT r.dag_id, r.state, r.execution_date, r.start_date, r.end_date
-                    FROM schema1.dag_run r
-                    INNER JOIN (
-                        SELECT dag_id, MAX(execution_date) as max_date
-                        FROM schema1.dag_run
-                        WHERE dag_id IN ({placeholders})
-                        GROUP BY dag_id
-                    ) latest ON r.dag_id = latest.dag_id AND r.execution_date = latest.max_date
-                    """
-                    await cursor.execute(query, dag_ids)
-                    rows = await cursor.fetchall()
-                    
-                    for row in rows:
-                        result[row['dag_id']] = {
-                            'state': row['state'],
-                            'execution_date': row['execution_date'],
-                            'start_date': row['start_date'],
-                            'end_date': row['end_date']
+                    if self.incremental:
+                        async with self.refresh_lock:
+                            await self._refresh_latest_runs(cursor, dag_ids)
+                            latest_runs = dict(self.latest_runs)
+                    else:
+                        latest_runs = {
+                            row['dag_id']: row
+                            for row in await self._fetch_latest_runs(cursor, dag_ids)
                         }
-                        
-                    # For any DAGs not found, add a default entry
+                    
                     for dag_id in dag_ids:
-                        if dag_id not in result:
+                        row = latest_runs.get(dag_id)
+                        if row:
+                            result[dag_id] = {
+                                'run_id': row['run_id'],
+                                'state': row['state'],
+                                'execution_date': row['execution_date'],
+                                'start_date': row['start_date'],
+                                'end_date': row['end_date']
+                            }
+                        else:
+                            # For any DAGs not found, add a default entry
                             result[dag_id] = {
                                 'state': 'unknown',
                                 'execution_date': None,
@@ -75,6 +165,8 @@ class AWSConnector:
                             }
         except Exception as e:
             logging.error(f"Error fetching DAG status: {e}")
+            if raise_errors:
+                raise
             # Return unknown status for all DAGs
             for dag_id in dag_ids:
                 result[dag_id] = {
@@ -86,3 +178,145 @@ class AWSConnector:
                 }
                 
         return result
+    
+    async def _refresh_latest_runs(self, cursor, dag_ids: List[str]):
+        """Bring the in-memory latest run table up to date for the given DAGs"""
+        now = time.monotonic()
+        if self.last_full_sync is None or now - self.last_full_sync >= self.full_resync_interval:
+            # Periodic full resync of every tracked DAG
+            resync_ids = list(dict.fromkeys(list(self.high_water_marks) + list(dag_ids)))
+            self.latest_runs = {}
+            self.high_water_marks = {}
+            self.last_full_sync = now
+        else:
+            resync_ids = [dag_id for dag_id in dag_ids if dag_id not in self.high_water_marks]
+        
+        if resync_ids:
+            rows = await self._fetch_latest_runs(cursor, resync_ids)
+            self._merge_runs(rows)
+            for dag_id in resync_ids:
+                self.high_water_marks.setdefault(dag_id, 0)
+            self._advance_high_water_marks(resync_ids, rows)
+        
+        tracked_ids = [dag_id for dag_id in dag_ids if dag_id not in resync_ids]
+        if tracked_ids:
+            rows = await self._fetch_changed_runs(cursor, tracked_ids)
+            self._merge_runs(rows)
+            self._advance_high_water_marks(tracked_ids, rows)
+    
+    async def _fetch_latest_runs(self, cursor, dag_ids: List[str]) -> List[Dict]:
+        """Full query for the latest run of each DAG"""
+        placeholders = ', '.join(['%s'] * len(dag_ids))
+        query = f"""
+        SELECT r.id, r.dag_id, r.run_id, r.state, r.execution_date, r.start_date, r.end_date
+        FROM schema1.dag_run r
+        INNER JOIN (
+            SELECT dag_id, MAX(execution_date) as max_date
+            FROM schema1.dag_run
+            WHERE dag_id IN ({placeholders})
+            GROUP BY dag_id
+        ) latest ON r.dag_id = latest.dag_id AND r.execution_date = latest.max_date
+        """
+        await cursor.execute(query, dag_ids)
+        rows = await cursor.fetchall()
+        self.rows_fetched += len(rows)
+        return rows
+    
+    async def _fetch_changed_runs(self, cursor, dag_ids: List[str]) -> List[Dict]:
+        """
+        Fetch runs newer than the high-water mark and the current rows of the latest runs
+        
+        Finished runs are re-read too: clearing a run in Airflow sets it back to
+        running under the same id.
+        """
+        placeholders = ', '.join(['%s'] * len(dag_ids))
+        query = f"""
+        SELECT id, dag_id, run_id, state, execution_date, start_date, end_date
+        FROM schema1.dag_run
+        WHERE dag_id IN ({placeholders}) AND id > %s
+        """
+        params = list(dag_ids) + [min(self.high_water_marks[dag_id] for dag_id in dag_ids)]
+        
+        latest_run_ids = [self.latest_runs[dag_id]['id'] for dag_id in dag_ids if dag_id in self.latest_runs]
+        if latest_run_ids:
+            query += f"""
+        UNION ALL
+        SELECT id, dag_id, run_id, state, execution_date, start_date, end_date
+        FROM schema1.dag_run
+        WHERE id IN ({', '.join(['%s'] * len(latest_run_ids))})
+        """
+            params += latest_run_ids
+        
+        await cursor.execute(query, params)
+        rows = await cursor.fetchall()
+        self.rows_fetched += len(rows)
+        return rows
+    
+    def _merge_runs(self, rows: List[Dict]):
+        """Merge dag_run rows into the latest run table"""
+        for row in rows:
+            current = self.latest_runs.get(row['dag_id'])
+            if (
+                current is None
+                or current['id'] == row['id']
+                or row['execution_date'] >= current['execution_date']
+            ):
+                self.latest_runs[row['dag_id']] = row
+    
+    def _advance_high_water_marks(self, dag_ids: List[str], rows: List[Dict]):
+        """Rows up to the highest id returned have been seen for every queried DAG"""
+        if not rows:
+            return
+        max_id = max(row['id'] for row in rows)
+        for dag_id in dag_ids:
+            if max_id > self.high_water_marks.get(dag_id, 0):
+                self.high_water_marks[dag_id] = max_id
+    
+    def run_key(self, details: Dict[str, Any]) -> Optional[str]:
+        """A DAG run is identified by its run_id"""
+        return details.get('run_id')
+    
+    async def fetch_tasks(
+        self,
+        mapping: Any,
+        run_key: str,
+        after: Optional[str] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """
+        Keyset page of task_instance rows of a DAG run, seeking past the last task id
+        
+        Task instances reference their run by run_id (Airflow 2.2+).
+        """
+        if not self.pool:
+            await self.connect()
+        
+        query = """
+        SELECT task_id, state, try_number, start_date, end_date, duration, operator, hostname
+        FROM schema1.task_instance
+        WHERE dag_id = %s AND run_id = %s
+        """
+        params = [mapping, run_key]
+        if after is not None:
+            query += " AND task_id > %s"
+            params.append(after)
+        query += " ORDER BY task_id LIMIT %s"
+        params.append(limit)
+        
+        async with self.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(query, params)
+                rows = await cursor.fetchall()
+        
+        tasks = []
+        for row in rows:
+            # Tasks that have not been scheduled yet have no state
+            task_state = (row['state'] or 'pending').lower()
+            tasks.append({
+                'task_id': row['task_id'],
+                'status': self.STATE_MAP.get(task_state, task_state),
+                'start_time': row['start_date'],
+                'end_time': row['end_date'],
+                'details': row
+            })
+        return tasks
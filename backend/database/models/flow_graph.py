@@ -0,0 +1,222 @@
+# models/flow_graph.py
+from typing import Dict, List, Tuple, Any, Optional
+
+class FlowGraph:
+    """
+    Compiled flow model
+
+    Nodes live in parallel arrays addressed by index, with hash maps from node id
+    and stage label to index, adjacency lists for the edges and lookup tables
+    from stage names to their source mappings. The React Flow JSON is rendered
+    on demand and cached until the graph changes.
+    """
+
+    __slots__ = (
+        "ids", "types", "labels", "node_categories", "parents", "positions", "styles",
+        "statuses", "sub_stages", "edge_sources", "edge_targets", "successors",
+        "predecessors", "id_index", "label_index", "sub_stage_index", "categories",
+        "stage_mappings", "mapping_stages", "_rendered"
+    )
+
+    def __init__(self):
+        # Node arrays
+        self.ids: List[str] = []
+        self.types: List[str] = []
+        self.labels: List[str] = []
+        self.node_categories: List[Optional[str]] = []
+        self.parents: List[Optional[int]] = []
+        self.positions: List[Tuple[int, int]] = []
+        self.styles: List[Optional[Dict[str, Any]]] = []
+        self.statuses: List[Optional[str]] = []
+        self.sub_stages: List[List[Tuple[str, str, str, List[int]]]] = []  # (id, name, type, successor positions)
+
+        # Edge arrays and adjacency lists of node indexes
+        self.edge_sources: List[int] = []
+        self.edge_targets: List[int] = []
+        self.successors: List[List[int]] = []
+        self.predecessors: List[List[int]] = []
+
+        # Lookup tables
+        self.id_index: Dict[str, int] = {}
+        self.label_index: Dict[str, int] = {}  # Stage label to index of its first stage node
+        self.sub_stage_index: Dict[str, List[Tuple[int, int]]] = {}  # Sub-stage name to its (stage index, position)s
+        self.categories: Dict[str, List[str]] = {}  # Category name to its stage ids
+        self.stage_mappings: Dict[str, Dict[str, Any]] = {}  # Source name to {stage name: mapping}
+        self.mapping_stages: Dict[str, Dict[Any, List[str]]] = {}  # Source name to {mapping: stage names}
+
+        self._rendered = None
+
+    @property
+    def node_count(self) -> int:
+        return len(self.ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.edge_sources)
+
+    def add_node(
+        self,
+        node_id: str,
+        node_type: str,
+        label: str,
+        position: Tuple[int, int],
+        category: Optional[str] = None,
+        parent: Optional[str] = None,
+        style: Optional[Dict[str, Any]] = None,
+        status: Optional[str] = None
+    ) -> int:
+        """Add a node and return its index"""
+        index = len(self.ids)
+        self.ids.append(node_id)
+        self.types.append(node_type)
+        self.labels.append(label)
+        self.node_categories.append(category)
+        self.parents.append(self.id_index[parent] if parent is not None else None)
+        self.positions.append(position)
+        self.styles.append(style)
+        self.statuses.append(status)
+        self.sub_stages.append([])
+        self.successors.append([])
+        self.predecessors.append([])
+
+        self.id_index[node_id] = index
+        if node_type == "category":
+            self.categories.setdefault(label, [])
+        elif node_type == "stage":
+            self.label_index.setdefault(label, index)
+            if category is not None:
+                self.categories.setdefault(category, []).append(node_id)
+
+        self._rendered = None
+        return index
+
+    def add_edge(self, source_id: str, target_id: str) -> int:
+        """Add an edge between two existing nodes and return its index"""
+        source = self.id_index[source_id]
+        target = self.id_index[target_id]
+        self.edge_sources.append(source)
+        self.edge_targets.append(target)
+        self.successors[source].append(target)
+        self.predecessors[target].append(source)
+        self._rendered = None
+        return len(self.edge_sources) - 1
+
+    def add_sub_stage(self, stage_index: int, sub_stage_id: str, name: str, sub_stage_type: str) -> int:
+        """Append a sub-stage to a stage node and return its position within the stage"""
+        sub_stages = self.sub_stages[stage_index]
+        # The same sub-stage name may appear under several stages
+        self.sub_stage_index.setdefault(name, []).append((stage_index, len(sub_stages)))
+        sub_stages.append((sub_stage_id, name, sub_stage_type, []))
+        self._rendered = None
+        return len(sub_stages) - 1
+
+    def link_sub_stages(self, stage_index: int, source: int, target: int):
+        """Add a dependency between two sub-stages of a stage, by position"""
+        self.sub_stages[stage_index][source][3].append(target)
+        self._rendered = None
+
+    def index_of(self, node_id: str) -> Optional[int]:
+        return self.id_index.get(node_id)
+
+    def stages_of(self, name: str) -> List[int]:
+        """Indexes of the stage nodes with a stage label or containing a sub-stage name"""
+        indexes = [self.label_index[name]] if name in self.label_index else []
+        for stage_index, _ in self.sub_stage_index.get(name, ()):
+            if stage_index not in indexes:
+                indexes.append(stage_index)
+        return indexes
+
+    def set_mappings(self, stage_mappings: Dict[str, Dict[str, Any]]):
+        """
+        Build the stage to mapping lookup tables
+
+        Args:
+            stage_mappings: Dict mapping source names to {stage name: mapping}, e.g.
+                DAG ids for AWS and {bpf_id, process_id} for on-prem stages
+        """
+        self.stage_mappings = {source: dict(mappings) for source, mappings in stage_mappings.items()}
+        self.mapping_stages = {}
+        for source, mappings in stage_mappings.items():
+            reverse = self.mapping_stages[source] = {}
+            for stage_name, mapping in mappings.items():
+                reverse.setdefault(self.mapping_key(mapping), []).append(stage_name)
+
+    @staticmethod
+    def mapping_key(mapping: Any) -> Any:
+        """Hashable form of a stage mapping"""
+        if isinstance(mapping, dict):
+            return tuple(sorted(mapping.items()))
+        return mapping
+
+    def stages_for(self, source: str, mapping: Any) -> List[str]:
+        """Stage names mapped to a DAG id / (bpf_id, process_id) pair of a source"""
+        return self.mapping_stages.get(source, {}).get(self.mapping_key(mapping), [])
+
+    def set_status(self, name: str, status: str) -> bool:
+        """Set the status of a stage by label in O(1)"""
+        index = self.label_index.get(name)
+        if index is None:
+            return False
+        if self.statuses[index] != status:
+            self.statuses[index] = status
+            self._rendered = None
+        return True
+
+    def to_react_flow(self) -> Dict[str, Any]:
+        """React Flow nodes, edges and categories, cached until the graph changes"""
+        if self._rendered is None:
+            self._rendered = {
+                "nodes": [self._render_node(index) for index in range(len(self.ids))],
+                "edges": [
+                    {
+                        "id": f"edge-{self.ids[source]}-{self.ids[target]}",
+                        "source": self.ids[source],
+                        "target": self.ids[target],
+                        "animated": True,
+                        "type": "smoothstep"
+                    }
+                    for source, target in zip(self.edge_sources, self.edge_targets)
+                ],
+                "categories": self.categories
+            }
+        return self._rendered
+
+    def _render_node(self, index: int) -> Dict[str, Any]:
+        x, y = self.positions[index]
+        if self.types[index] == "category":
+            return {
+                "id": self.ids[index],
+                "type": "category",
+                "data": {
+                    "label": self.labels[index],
+                    "stages": []
+                },
+                "position": {"x": x, "y": y},
+                "style": self.styles[index]
+            }
+
+        stage_sub_stages = self.sub_stages[index]
+        sub_stages = []
+        for sub_stage_id, name, sub_stage_type, successors in stage_sub_stages:
+            sub_stage = {"id": sub_stage_id, "name": name, "type": sub_stage_type}
+            if successors:
+                sub_stage["next"] = stage_sub_stages[successors[0]][0]
+                if len(successors) > 1:
+                    sub_stage["nextAll"] = [stage_sub_stages[position][0] for position in successors]
+            sub_stages.append(sub_stage)
+
+        node = {
+            "id": self.ids[index],
+            "type": self.types[index],
+            "data": {
+                "label": self.labels[index],
+                "category": self.node_categories[index],
+                "status": self.statuses[index],
+                "subStages": sub_stages
+            },
+            "position": {"x": x, "y": y}
+        }
+        if self.parents[index] is not None:
+            node["parentNode"] = self.ids[self.parents[index]]
+            node["extent"] = "parent"
+        return node
@@ -1,169 +1,322 @@
 # models/flow_parser.py
-import re
-from typing import Dict, List, Set, Tuple, Any, Union
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from models.flow_graph import FlowGraph
+
+class FlowParseError(ValueError):
+    """Syntax error in a flow definition, with the position it was found at"""
+
+    def __init__(self, message: str, text: str, position: int, context: str = "overall"):
+        self.message = message
+        self.text = text
+        self.position = position
+        self.context = context
+        super().__init__(f"{context}: {message} at position {position}\n  {text}\n  {' ' * position}^")
+
+class FlowExpressionParser:
+    """
+    Single-pass tokenizer and recursive-descent parser for flow expressions
+
+    Grammar:
+        overall   := category ( '->'? category )*
+        category  := NAME '{' sequence '}'
+        sequence  := parallel ( '->' parallel )*
+        parallel  := term ( ',' term )*
+        term      := NAME | '(' sequence ')'
+
+    Category blocks written next to each other without '->' (A{..} B{..}) run in
+    sequence, as the regex-based parser this one replaced read them.
+    Names run up to the next delimiter ({ } ( ) , ->) and are stripped, so they
+    may contain '-' and inner spaces. Expressions parse to nested tuples:
+    ("name", text, position), ("seq", items) and ("par", items).
+    """
+
+    DELIMITERS = "{}(),"
+
+    def __init__(self, text: str, context: str = "overall"):
+        self.text = text
+        self.context = context
+        self.tokens = self._tokenize()
+        self.index = 0
+
+    def _tokenize(self) -> List[Tuple[str, str, int]]:
+        """Split the text into (kind, value, position) tokens"""
+        tokens = []
+        text = self.text
+        i = 0
+        while i < len(text):
+            char = text[i]
+            if char.isspace():
+                i += 1
+            elif char in self.DELIMITERS:
+                tokens.append((char, char, i))
+                i += 1
+            elif text.startswith("->", i):
+                tokens.append(("->", "->", i))
+                i += 2
+            else:
+                start = i
+                while i < len(text) and text[i] not in self.DELIMITERS and not text.startswith("->", i):
+                    i += 1
+                tokens.append(("name", text[start:i].strip(), start))
+        tokens.append(("end", "", len(text)))
+        return tokens
+
+    def _peek(self) -> Tuple[str, str, int]:
+        return self.tokens[self.index]
+
+    def _expect(self, kind: str) -> Tuple[str, str, int]:
+        token = self.tokens[self.index]
+        if token[0] != kind:
+            found = "end of definition" if token[0] == "end" else repr(token[1])
+            raise FlowParseError(f"expected {'a name' if kind == 'name' else repr(kind)}, found {found}", self.text, token[2], self.context)
+        self.index += 1
+        return token
+
+    def parse_overall(self) -> List[Tuple[str, int, Tuple]]:
+        """Parse an overall flow into a list of (category name, position, sequence)"""
+        categories = [self._category()]
+        while self._peek()[0] in ("->", "name"):
+            if self._peek()[0] == "->":
+                self.index += 1
+            categories.append(self._category())
+        self._expect("end")
+        return categories
+
+    def parse_sequence(self) -> Tuple:
+        """Parse a standalone sequence, as used for sub-stages"""
+        sequence = self._sequence()
+        self._expect("end")
+        return sequence
+
+    def _category(self) -> Tuple[str, int, Tuple]:
+        _, name, position = self._expect("name")
+        self._expect("{")
+        sequence = self._sequence()
+        self._expect("}")
+        return name, position, sequence
+
+    def _sequence(self) -> Tuple:
+        items = [self._parallel()]
+        while self._peek()[0] == "->":
+            self.index += 1
+            items.append(self._parallel())
+        return items[0] if len(items) == 1 else ("seq", tuple(items))
+
+    def _parallel(self) -> Tuple:
+        items = [self._term()]
+        while self._peek()[0] == ",":
+            self.index += 1
+            items.append(self._term())
+        return items[0] if len(items) == 1 else ("par", tuple(items))
+
+    def _term(self) -> Tuple:
+        if self._peek()[0] == "(":
+            self.index += 1
+            sequence = self._sequence()
+            self._expect(")")
+            return sequence
+        _, name, position = self._expect("name")
+        return ("name", name, position)
+
+# Parsed definitions by hash of the canonical flowDefinition JSON
+_PARSE_CACHE: "OrderedDict[str, Tuple]" = OrderedDict()
+_PARSE_CACHE_SIZE = 256
+
+def parse_definition(overall_flow: str, sub_stages: Dict[str, Dict[str, str]]) -> Tuple:
+    """
+    Parse a flow definition, memoized by its hash so unchanged definitions never re-parse
+
+    Returns:
+        Tuple of the parsed categories and a Dict of (category, stage) to parsed sub-stages
+    """
+    digest = hashlib.sha1(
+        json.dumps([overall_flow, sub_stages], sort_keys=True).encode()
+    ).hexdigest()
+    cached = _PARSE_CACHE.get(digest)
+    if cached is not None:
+        _PARSE_CACHE.move_to_end(digest)
+        return cached
+
+    categories = FlowExpressionParser(overall_flow).parse_overall()
+    parsed_sub_stages = {}
+    for category_name, stages in sub_stages.items():
+        for stage_name, sub_stages_str in stages.items():
+            parser = FlowExpressionParser(sub_stages_str, f"subStages.{category_name}.{stage_name}")
+            parsed_sub_stages[(category_name, stage_name)] = parser.parse_sequence()
+
+    parsed = (tuple(categories), parsed_sub_stages)
+    _PARSE_CACHE[digest] = parsed
+    if len(_PARSE_CACHE) > _PARSE_CACHE_SIZE:
+        _PARSE_CACHE.popitem(last=False)
+    return parsed
 
 class FlowParser:
     """Parser for the flow definition format"""
-    
+
     def __init__(self, overall_flow: str, sub_stages: Dict[str, Dict[str, str]]):
         self.overall_flow = overall_flow
         self.sub_stages = sub_stages
-        self.nodes = []  # List of node objects
-        self.edges = []  # List of edge objects
-        self.categories = {}  # Mapping of category name to list of node IDs
-        
+        self.graph = None  # Compiled FlowGraph, built on first use
+
     def parse(self) -> Dict:
         """Parse the flow definition and return a structured representation for visualization"""
-        # Parse overall flow to get main categories and their connections
-        self._parse_overall_flow()
-        
-        # Parse sub-stages to get detailed node structure
-        self._parse_sub_stages()
-        
-        # Build the final flow structure
-        return {
-            "nodes": self.nodes,
-            "edges": self.edges,
-            "categories": self.categories
-        }
-    
-    def _parse_overall_flow(self):
-        """Parse the overall flow to extract main categories and dependencies"""
-        # Extract category blocks using regex
-        category_pattern = r'([A-Za-z0-9_-]+)\{([^{}]+)\}'
-        category_matches = re.findall(category_pattern, self.overall_flow)
-        
+        return self.compile().to_react_flow()
+
+    def compile(self) -> FlowGraph:
+        """Parse the flow definition into an indexed FlowGraph"""
+        if self.graph is None:
+            categories, sub_stages = parse_definition(self.overall_flow, self.sub_stages)
+            self.graph = FlowGraph()
+
+            # Build category and stage nodes with their dependencies
+            self._build_categories(categories)
+
+            # Attach sub-stages to their stage nodes
+            self._build_sub_stages(sub_stages)
+        return self.graph
+
+    def _build_categories(self, categories: Tuple):
+        """Add category and stage nodes, connecting the exits of each category to the entries of the next"""
+        graph = self.graph
+
         # Track position for layout
         x_position = 100
         y_position = 100
-        last_category_id = None
-        
-        for category_name, content in category_matches:
-            # Create category node
+        last_exits = []
+
+        for category_name, position, sequence in categories:
             category_id = f"category-{category_name}"
-            self.nodes.append({
-                "id": category_id,
-                "type": "category",
-                "data": {
-                    "label": category_name,
-                    "stages": []
-                },
-                "position": {"x": x_position, "y": y_position},
-                "style": {
+            if graph.index_of(category_id) is not None:
+                raise FlowParseError(f"duplicate category {category_name!r}", self.overall_flow, position)
+
+            graph.add_node(
+                category_id,
+                "category",
+                category_name,
+                (x_position, y_position),
+                style={
                     "width": 500,
                     "height": 400
                 }
-            })
-            
-            # Initialize category in categories mapping
-            self.categories[category_name] = []
-            
-            # Extract stages within this category
-            stages = [s.strip() for s in content.split('->')]
-            
-            # Track position within category
-            stage_x = 50
-            stage_y = 80
-            last_stage_id = None
-            
-            for stage in stages:
-                stage_id = f"stage-{category_name}-{stage}"
-                
-                # Add stage to nodes
-                self.nodes.append({
-                    "id": stage_id,
-                    "type": "stage",
-                    "data": {
-                        "label": stage,
-                        "category": category_name,
-                        "status": "pending",
-                        "subStages": []
-                    },
-                    "position": {"x": stage_x, "y": stage_y},
-                    "parentNode": category_id,
-                    "extent": "parent"
-                })
-                
-                # Add stage to its category
-                self.categories[category_name].append(stage_id)
-                
-                # Connect to previous stage if exists
-                if last_stage_id:
-                    self.edges.append({
-                        "id": f"edge-{last_stage_id}-{stage_id}",
-                        "source": last_stage_id,
-                        "target": stage_id,
-                        "animated": True,
-                        "type": "smoothstep"
-                    })
-                
-                # Update for next stage
-                last_stage_id = stage_id
-                stage_x += 150
-            
-            # Connect categories if needed
-            if last_category_id:
-                # Find the last stage of previous category
-                prev_category_stages = self.categories[last_category_id.replace("category-", "")]
-                if prev_category_stages:
-                    self.edges.append({
-                        "id": f"edge-{prev_category_stages[-1]}-{self.categories[category_name][0]}",
-                        "source": prev_category_stages[-1],
-                        "target": self.categories[category_name][0],
-                        "animated": True,
-                        "type": "smoothstep"
-                    })
-            
-            # Update for next category
-            last_category_id = category_id
+            )
+
+            entries, exits, _, _ = self._build_stages(category_name, category_id, sequence, 0, 0)
+
+            # Fan in from every exit of the previous category to every entry of this one
+            for source in last_exits:
+                for target in entries:
+                    graph.add_edge(source, target)
+
+            last_exits = exits
             x_position += 600
-    
-    def _parse_sub_stages(self):
-        """Parse sub-stages to get detailed node structure"""
-        for category_name, stages in self.sub_stages.items():
-            for stage_name, sub_stages_str in stages.items():
-                stage_id = f"stage-{category_name}-{stage_name}"
-                
-                # Find the stage node
-                stage_node = next((node for node in self.nodes if node["id"] == stage_id), None)
-                if not stage_node:
-                    continue
-                
-                # Parse sub-stages
-                if '->' in sub_stages_str:
-                    # Sequential sub-stages
-                    sub_stages = [s.strip() for s in sub_stages_str.split('->')]
-                    last_sub_stage = None
-                    
-                    for sub_stage in sub_stages:
-                        sub_stage_id = f"substage-{category_name}-{stage_name}-{sub_stage}"
-                        stage_node["data"]["subStages"].append({
-                            "id": sub_stage_id,
-                            "name": sub_stage,
-                            "type": "sequential"
-                        })
-                        
-                        if last_sub_stage:
-                            stage_node["data"]["subStages"][-2]["next"] = sub_stage_id
-                        
-                        last_sub_stage = sub_stage_id
-                elif ',' in sub_stages_str:
-                    # Parallel sub-stages
-                    sub_stages = [s.strip() for s in sub_stages_str.split(',')]
-                    
-                    for sub_stage in sub_stages:
-                        sub_stage_id = f"substage-{category_name}-{stage_name}-{sub_stage}"
-                        stage_node["data"]["subStages"].append({
-                            "id": sub_stage_id,
-                            "name": sub_stage,
-                            "type": "parallel"
-                        })
-                else:
-                    # Single sub-stage
-                    sub_stage = sub_stages_str.strip()
-                    sub_stage_id = f"substage-{category_name}-{stage_name}-{sub_stage}"
-                    stage_node["data"]["subStages"].append({
-                        "id": sub_stage_id,
-                        "name": sub_stage,
-                        "type": "single"
-                    })
+
+    def _build_stages(
+        self,
+        category_name: str,
+        category_id: str,
+        expression: Tuple,
+        column: int,
+        row: int
+    ) -> Tuple[List[str], List[str], int, int]:
+        """
+        Add the stages of an expression laid out on a grid from (column, row)
+
+        Sequences advance the column and parallel groups the row.
+
+        Returns:
+            Tuple of entry stage ids, exit stage ids, width and height in cells
+        """
+        graph = self.graph
+        kind = expression[0]
+
+        if kind == "name":
+            _, stage, position = expression
+            stage_id = f"stage-{category_name}-{stage}"
+            if graph.index_of(stage_id) is not None:
+                raise FlowParseError(f"duplicate stage {stage!r}", self.overall_flow, position)
+
+            graph.add_node(
+                stage_id,
+                "stage",
+                stage,
+                (50 + 150 * column, 80 + 100 * row),
+                category=category_name,
+                parent=category_id,
+                status="pending"
+            )
+            return [stage_id], [stage_id], 1, 1
+
+        if kind == "seq":
+            entries, exits = None, []
+            width, height = 0, 0
+            for item in expression[1]:
+                item_entries, item_exits, item_width, item_height = self._build_stages(
+                    category_name, category_id, item, column + width, row
+                )
+                for source in exits:
+                    for target in item_entries:
+                        graph.add_edge(source, target)
+                if entries is None:
+                    entries = item_entries
+                exits = item_exits
+                width += item_width
+                height = max(height, item_height)
+            return entries, exits, width, height
+
+        # Parallel group
+        entries, exits = [], []
+        width, height = 0, 0
+        for item in expression[1]:
+            item_entries, item_exits, item_width, item_height = self._build_stages(
+                category_name, category_id, item, column, row + height
+            )
+            entries.extend(item_entries)
+            exits.extend(item_exits)
+            width = max(width, item_width)
+            height += item_height
+        return entries, exits, width, height
+
+    def _build_sub_stages(self, sub_stages: Dict[Tuple[str, str], Tuple]):
+        """Attach sub-stages, typed by their enclosing group, with successor links"""
+        graph = self.graph
+
+        for (category_name, stage_name), expression in sub_stages.items():
+            stage_id = f"stage-{category_name}-{stage_name}"
+
+            # Find the stage node
+            stage_index = graph.index_of(stage_id)
+            if stage_index is None:
+                continue
+
+            def build(expression: Tuple, sub_stage_type: str) -> Tuple[List[int], List[int]]:
+                kind = expression[0]
+                if kind == "name":
+                    name = expression[1]
+                    sub_stage_id = f"substage-{category_name}-{stage_name}-{name}"
+                    position = graph.add_sub_stage(stage_index, sub_stage_id, name, sub_stage_type)
+                    return [position], [position]
+
+                if kind == "seq":
+                    entries, exits = None, []
+                    for item in expression[1]:
+                        item_entries, item_exits = build(item, "sequential")
+                        for source in exits:
+                            for target in item_entries:
+                                graph.link_sub_stages(stage_index, source, target)
+                        if entries is None:
+                            entries = item_entries
+                        exits = item_exits
+                    return entries, exits
+
+                entries, exits = [], []
+                for item in expression[1]:
+                    item_entries, item_exits = build(item, "parallel")
+                    entries.extend(item_entries)
+                    exits.extend(item_exits)
+                return entries, exits
+
+            build(expression, "single")
@@ -1,9 +1,17 @@
 # database/oracle_connector.py
 import oracledb
 import logging
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Any
 
-class OracleConnector:
+from database.status_source import StatusSource, register_source
+
+@register_source("oracle")
+class OracleConnector(StatusSource):
+    # Oracle allows at most 1000 expressions in an IN-list
+    MAX_PAIRS_PER_QUERY = 500
+    
+    key_fields = ("host", "service", "user")
+    
     def __init__(self, host: str, user: str, password: str, service: str):
         self.host = host
         self.user = user
@@ -18,9 +26,11 @@ class OracleConnector:
                     user=self.user,
                     password=self.password,
                     dsn=f"{self.host}/{self.service}",
-                    min=1,
-                    max=5,
-                    increment=1
+                    min=self.pool_options["min_size"],
+                    max=self.pool_options["max_size"],
+                    increment=1,
+                    timeout=self.pool_options["recycle"],
+                    ping_interval=0 if self.pool_options["pre_ping"] else -1
                 )
                 logging.info("Connected to Oracle database")
             except Exception as e:
@@ -30,14 +40,73 @@ class OracleConnector:
     async def close(self):
         if self.pool:
             await self.pool.close()
+            self.pool = None
             logging.info("Closed connection to Oracle database")
     
-    async def get_stage_status(self, stage_mappings: Dict[str, Dict[str, int]]) -> Dict[str, Dict]:
+    async def _acquire_connection(self):
+        return await self.pool.acquire()
+    
+    async def _release_connection(self, conn):
+        await self.pool.release(conn)
+    
+    def pool_size(self) -> Optional[int]:
+        return self.pool.opened if self.pool else None
+    
+    async def ping(self):
+        if not self.pool:
+            await self.connect()
+        async with self.acquire() as conn:
+            cursor = conn.cursor()
+            await cursor.execute("SELECT 1 FROM dual")
+            await cursor.fetchall()
+            await cursor.close()
+    
+    def mapping_key(self, mapping: Dict[str, int]) -> str:
+        """Key identifying an on-prem stage by its bpf_id and process_id"""
+        return f"{mapping.get('bpf_id')}:{mapping.get('process_id')}"
+    
+    async def batch_fetch(self, keys: Dict[str, Any]) -> Dict[str, Dict]:
+        """Stage mappings are (bpf_id, process_id) pairs, fetched with batched IN-list queries"""
+        return await self.get_stage_status(keys, raise_errors=True)
+    
+    def map_status(self, stage_rows: Dict[str, Optional[Dict]]) -> Dict[str, Any]:
+        """Map Oracle stage status rows to stage status"""
+        result = {}
+        for stage_name, status_info in stage_rows.items():
+            if status_info is None:
+                status_info = {'status': 'not_found'}
+            
+            # Map Oracle status to our status format
+            oracle_status_value = status_info.get('status', '').lower()
+            status = {
+                'not_started': 'pending',
+                'running': 'running',
+                'failed': 'failed',
+                'completed': 'completed'
+            }.get(oracle_status_value, oracle_status_value)
+            
+            result[stage_name] = {
+                'status': status,
+                'start_time': status_info.get('start_date'),
+                'end_time': status_info.get('end_date'),
+                'details': status_info
+            }
+        return result
+    
+    async def get_stage_status(
+        self,
+        stage_mappings: Dict[str, Dict[str, int]],
+        raise_errors: bool = False
+    ) -> Dict[str, Dict]:
         """
         Get status for on-prem stages
         
+        All (bpf_id, process_id) pairs are fetched with one tuple IN-list query per
+        chunk of MAX_PAIRS_PER_QUERY pairs, instead of one query per stage.
+        
         Args:
             stage_mappings: Dict mapping stage names to {bpf_id, process_id} Dict
+            raise_errors: Raise query errors instead of marking every stage as error
             
         Returns:
             Dict mapping stage names to status information
@@ -47,67 +116,116 @@ class OracleConnector:
             
         result = {}
         
+        # Group stage names by (bpf_id, process_id), several stages may share a pair
+        pair_stages: Dict[Tuple[int, int], List[str]] = {}
+        for stage_name, mapping in stage_mappings.items():
+            bpf_id = mapping.get('bpf_id')
+            process_id = mapping.get('process_id')
+            
+            if not bpf_id or not process_id:
+                result[stage_name] = {
+                    'status': 'Unknown',
+                    'start_date': None,
+                    'end_date': None,
+                    'error': 'Missing bpf_id or process_id'
+                }
+                continue
+            
+            # Configs may hold the ids as strings, rows are matched on ints
+            try:
+                pair = (int(bpf_id), int(process_id))
+            except (TypeError, ValueError):
+                result[stage_name] = {
+                    'status': 'Unknown',
+                    'start_date': None,
+                    'end_date': None,
+                    'error': 'bpf_id and process_id must be integers'
+                }
+                continue
+            pair_stages.setdefault(pair, []).append(stage_name)
+        
+        if not pair_stages:
+            return result
+        
         try:
-            async with self.pool.acquire() as conn:
+            rows = {}
+            pairs = list(pair_stages)
+            
+            async with self.acquire() as conn:
                 cursor = conn.cursor()
                 
-                for stage_name, mapping in stage_mappings.items():
-                    bpf_id = mapping.get('bpf_id')
-                    process_id = mapping.get('process_id')
-                    
-                    if not bpf_id or not process_id:
-                        result[stage_name] = {
-                            'status': 'Unknown',
-                            'start_date': None,
-                            'end_date': None,
-                            'error': 'Missing bpf_id or process_id'
-                        }
-                        continue
+                for offset in range(0, len(pairs), self.MAX_PAIRS_PER_QUERY):
+                    chunk = pairs[offset:offset + self.MAX_PAIRS_PER_QUERY]
+                    query, params = self._build_batch_query(chunk)
                     
-                    query = """
-                    SELECT status, start_date, end_date
-                    FROM on_prem_schema1.stage_status
-                    WHERE bpf_id = :bpf_id AND process_id = :process_id
-                    """
+                    await cursor.execute(query, params)
+                    chunk_rows = await cursor.fetchall()
+                    self.rows_fetched += len(chunk_rows)
+                    for row in chunk_rows:
+                        # Keep the first row per pair, as the per-stage fetchone did
+                        rows.setdefault((int(row[0]), int(row[1])), row)
+                
+                await cursor.close()
+            
+            for pair, stage_names in pair_stages.items():
+                row = rows.get(pair)
+                
+                if row:
+                    status_text = row[2]  # Status is a string: Not_started, Running, Failed
                     
-                    await cursor.execute(query, bpf_id=bpf_id, process_id=process_id)
-                    row = await cursor.fetchone()
+                    # Map Oracle status to our standardized status
+                    mapped_status = {
+                        'Not_started': 'pending',
+                        'Running': 'running',
+                        'Failed': 'failed',
+                        'Completed': 'completed'
+                    }.get(status_text, status_text.lower())
                     
-                    if row:
-                        status_text = row[0]  # Status is a string: Not_started, Running, Failed
-                        
-                        # Map Oracle status to our standardized status
-                        mapped_status = {
-                            'Not_started': 'pending',
-                            'Running': 'running',
-                            'Failed': 'failed',
-                            'Completed': 'completed'
-                        }.get(status_text, status_text.lower())
-                        
-                        result[stage_name] = {
-                            'status': mapped_status,
-                            'original_status': status_text,
-                            'start_date': row[1],
-                            'end_date': row[2]
-                        }
-                    else:
-                        result[stage_name] = {
-                            'status': 'not_found',
-                            'start_date': None,
-                            'end_date': None
-                        }
+                    status_info = {
+                        'status': mapped_status,
+                        'original_status': status_text,
+                        'start_date': row[3],
+                        'end_date': row[4]
+                    }
+                else:
+                    status_info = {
+                        'status': 'not_found',
+                        'start_date': None,
+                        'end_date': None
+                    }
                 
-                await cursor.close()
+                for stage_name in stage_names:
+                    result[stage_name] = dict(status_info)
                 
         except Exception as e:
             logging.error(f"Error fetching Oracle stage status: {e}")
+            if raise_errors:
+                raise
             # Return error status for all stages
-            for stage_name in stage_mappings:
-                result[stage_name] = {
-                    'status': 'error',
-                    'start_date': None,
-                    'end_date': None,
-                    'error': str(e)
-                }
+            for stage_names in pair_stages.values():
+                for stage_name in stage_names:
+                    result[stage_name] = {
+                        'status': 'error',
+                        'start_date': None,
+                        'end_date': None,
+                        'error': str(e)
+                    }
                 
         return result
+    
+    @staticmethod
+    def _build_batch_query(pairs: List[Tuple[int, int]]) -> Tuple[str, Dict[str, int]]:
+        """Build a tuple IN-list query with bind variables for the given pairs"""
+        params = {}
+        placeholders = []
+        for i, (bpf_id, process_id) in enumerate(pairs):
+            params[f"b{i}"] = bpf_id
+            params[f"p{i}"] = process_id
+            placeholders.append(f"(:b{i}, :p{i})")
+        
+        query = f"""
+        SELECT bpf_id, process_id, status, start_date, end_date
+        FROM on_prem_schema1.stage_status
+        WHERE (bpf_id, process_id) IN ({', '.join(placeholders)})
+        """
+        return query, params
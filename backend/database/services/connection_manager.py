@@ -0,0 +1,268 @@
+# services/connection_manager.py
+import asyncio
+import logging
+import time
+from typing import Dict, List, Any, Optional, Set, Tuple, Union
+
+from fastapi import WebSocket
+
+from services.status_encoder import StatusEncoder, DEFAULT_ENCODER
+
+class ClientChannel:
+    """Bounded outbound queue and sender task for one WebSocket client"""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_queue: int,
+        heartbeat: bool = False,
+        encoder: StatusEncoder = DEFAULT_ENCODER,
+        details: bool = False
+    ):
+        self.websocket = websocket
+        self.encoder = encoder  # Wire format negotiated on connect
+        self.details = details  # Keep raw database rows in the trimmed stage schema
+        self.flows: Set[str] = set()  # Flows the client is subscribed to
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.lag = 0  # Messages dropped since the last successful send
+        self.dropped = 0
+        self.heartbeat = heartbeat  # Client answers pings, evict it when it goes quiet
+        self.last_seen = time.monotonic()
+        self.task = None
+
+    @property
+    def format_key(self) -> Tuple[str, bool]:
+        return self.encoder.name, self.details
+
+    def offer(self, message: Union[str, bytes]) -> bool:
+        """
+        Queue a message without waiting
+
+        When the queue is full the oldest message is dropped, so a lagging client
+        always receives the latest update.
+
+        Returns:
+            False if a message had to be dropped
+        """
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.queue.get_nowait()
+            self.queue.put_nowait(message)
+            self.lag += 1
+            self.dropped += 1
+            return False
+
+    @property
+    def name(self) -> str:
+        return ", ".join(sorted(self.flows)) or "no flows"
+
+class EventStream:
+    """
+    Stands in for a WebSocket so Server-Sent Events clients share the fan-out
+
+    The manager's sender task hands each encoded event to a one-slot queue that
+    the HTTP response drains; a client that stops reading makes the send time
+    out and is evicted like a stalled WebSocket.
+    """
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.closed = asyncio.Event()
+
+    async def accept(self, subprotocol: Optional[str] = None):
+        pass
+
+    async def send_text(self, message: str):
+        await self.queue.put(message)
+
+    async def close(self, code: int = 1000):
+        self.closed.set()
+
+    async def events(self, keepalive: float = 15.0):
+        """Yield encoded events until closed, with a comment line every keepalive seconds of silence"""
+        closed = asyncio.ensure_future(self.closed.wait())
+        try:
+            while not self.closed.is_set():
+                get = asyncio.ensure_future(self.queue.get())
+                done, _ = await asyncio.wait({get, closed}, timeout=keepalive, return_when=asyncio.FIRST_COMPLETED)
+                if get in done:
+                    yield get.result()
+                else:
+                    get.cancel()
+                    if not done:
+                        # Keeps proxies from timing out an idle stream
+                        yield ": keepalive\n\n"
+        finally:
+            closed.cancel()
+
+class ConnectionManager:
+    """
+    WebSocket fan-out with topic routing
+
+    A client subscribes to any number of flows over one socket. Each client has
+    a bounded queue drained by its own sender task, with a send timeout and
+    eviction once it lags too far behind. Multiplexed clients are pinged and
+    evicted when they stop answering. Messages are passed as dicts and encoded
+    once per wire format in use, not once per client.
+    """
+
+    def __init__(self, max_queue: int = 8, send_timeout: float = 5.0, max_lag: int = 32):
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout  # seconds
+        self.max_lag = max_lag  # Dropped messages in a row before a client is evicted
+        self.active_connections: Dict[str, List[WebSocket]] = {}  # Subscribers per flow
+        self.channels: Dict[WebSocket, ClientChannel] = {}
+        self.flow_stats: Dict[str, Dict[str, int]] = {}  # Cumulative dropped/evicted per flow
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        flow_name: Optional[str] = None,
+        heartbeat: bool = False,
+        encoder: StatusEncoder = DEFAULT_ENCODER,
+        subprotocol: Optional[str] = None,
+        details: bool = False
+    ):
+        """Accept a client, optionally subscribed to one flow right away"""
+        await websocket.accept(subprotocol=subprotocol)
+        channel = ClientChannel(websocket, self.max_queue, heartbeat, encoder, details)
+        channel.task = asyncio.create_task(self._sender(channel))
+        self.channels[websocket] = channel
+        if flow_name is not None:
+            self.subscribe(websocket, flow_name)
+
+    def subscribe(self, websocket: WebSocket, flow_name: str) -> bool:
+        """Route a flow's messages to a connected client"""
+        channel = self.channels.get(websocket)
+        if channel is None:
+            return False
+        if flow_name not in channel.flows:
+            channel.flows.add(flow_name)
+            self.active_connections.setdefault(flow_name, []).append(websocket)
+            self.flow_stats.setdefault(flow_name, {"dropped": 0, "evicted": 0})
+        return True
+
+    def unsubscribe(self, websocket: WebSocket, flow_name: str) -> bool:
+        """Stop routing a flow's messages to a client"""
+        channel = self.channels.get(websocket)
+        if channel is None or flow_name not in channel.flows:
+            return False
+        channel.flows.discard(flow_name)
+        subscribers = self.active_connections.get(flow_name)
+        if subscribers and websocket in subscribers:
+            subscribers.remove(websocket)
+            if not subscribers:
+                del self.active_connections[flow_name]
+        return True
+
+    def disconnect(self, websocket: WebSocket):
+        """Drop a client and all of its subscriptions"""
+        channel = self.channels.get(websocket)
+        if channel is None:
+            return
+        for flow_name in list(channel.flows):
+            self.unsubscribe(websocket, flow_name)
+        del self.channels[websocket]
+
+        if channel.task and channel.task is not asyncio.current_task():
+            channel.task.cancel()
+
+    def touch(self, websocket: WebSocket):
+        """Note that a client is alive, called for every message it sends"""
+        channel = self.channels.get(websocket)
+        if channel:
+            channel.last_seen = time.monotonic()
+
+    async def send(self, websocket: WebSocket, message: Dict[str, Any], flow_name: Optional[str] = None):
+        """Queue a message for a single client"""
+        channel = self.channels.get(websocket)
+        if channel:
+            self._offer(channel, channel.encoder.encode(message, channel.details), flow_name)
+
+    async def broadcast(self, message: Dict[str, Any], flow_name: str):
+        """Queue a message for every subscriber of a flow, never waiting on a socket"""
+        encoded = {}  # Encoded once per wire format
+        for websocket in list(self.active_connections.get(flow_name, [])):
+            channel = self.channels.get(websocket)
+            if channel:
+                if channel.format_key not in encoded:
+                    encoded[channel.format_key] = channel.encoder.encode(message, channel.details)
+                self._offer(channel, encoded[channel.format_key], flow_name)
+
+    def _offer(self, channel: ClientChannel, message: Union[str, bytes], flow_name: Optional[str] = None):
+        if channel.offer(message):
+            return
+
+        if flow_name in self.flow_stats:
+            self.flow_stats[flow_name]["dropped"] += 1
+        if channel.lag > self.max_lag:
+            logging.warning(f"Evicting WebSocket client of {channel.name}: {channel.lag} updates behind")
+            self._evict(channel)
+
+    def _evict(self, channel: ClientChannel):
+        for flow_name in channel.flows:
+            self.flow_stats[flow_name]["evicted"] += 1
+        self.disconnect(channel.websocket)
+        asyncio.create_task(self._close(channel.websocket))
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            # 1013: try again later
+            await asyncio.wait_for(websocket.close(code=1013), timeout=self.send_timeout)
+        except Exception:
+            pass
+
+    async def _sender(self, channel: ClientChannel):
+        """Drain one client's queue, evicting it if a send times out or fails"""
+        try:
+            while True:
+                message = await channel.queue.get()
+                if isinstance(message, bytes):
+                    send = channel.websocket.send_bytes(message)
+                else:
+                    send = channel.websocket.send_text(message)
+                await asyncio.wait_for(send, timeout=self.send_timeout)
+                channel.lag = 0
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            logging.warning(f"Evicting WebSocket client of {channel.name}: send timed out")
+            self._evict(channel)
+        except Exception as e:
+            logging.info(f"WebSocket client of {channel.name} went away: {e}")
+            self.disconnect(channel.websocket)
+
+    async def heartbeat(self, interval: float = 15.0, timeout: float = 45.0):
+        """Ping multiplexed clients every interval seconds, evicting those silent for timeout seconds"""
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            ping = {"type": "ping", "time": time.time()}
+            for channel in list(self.channels.values()):
+                if not channel.heartbeat:
+                    continue
+                if now - channel.last_seen > timeout:
+                    logging.info(f"Evicting WebSocket client of {channel.name}: no reply for {now - channel.last_seen:.0f}s")
+                    self._evict(channel)
+                else:
+                    self._offer(channel, channel.encoder.encode(ping))
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Client count, queue depth and dropped/evicted counters per flow"""
+        stats = {}
+        for flow_name, counters in self.flow_stats.items():
+            depths = [
+                self.channels[websocket].queue.qsize()
+                for websocket in self.active_connections.get(flow_name, [])
+                if websocket in self.channels
+            ]
+            stats[flow_name] = {
+                "clients": len(depths),
+                "queue_depth": sum(depths),
+                "max_queue_depth": max(depths, default=0),
+                "dropped": counters["dropped"],
+                "evicted": counters["evicted"]
+            }
+        return stats
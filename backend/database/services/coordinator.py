@@ -0,0 +1,254 @@
+# services/coordinator.py
+import asyncio
+import fcntl
+import itertools
+import json
+import logging
+import os
+from typing import Dict, List, Any, Optional, Callable, Awaitable
+from datetime import datetime
+
+def _encode(value: Any) -> Any:
+    """Tag datetimes so they survive the round trip, other unknown types become strings"""
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    return str(value)
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and "$dt" in obj:
+        return datetime.fromisoformat(obj["$dt"])
+    return obj
+
+class Coordinator:
+    """
+    Coordinates several worker processes of one deployment
+
+    Workers compete for an exclusive flock on <directory>/leader.lock. The
+    holder is the leader: it runs the pollers and serves a Unix socket at
+    <directory>/bus.sock over which it sends every status update to the other
+    workers (newline-delimited JSON), so each can serve its own WebSocket
+    clients. Followers write back over the same socket: their report (e.g. the
+    flows their clients watch) whenever it changes, and requests such as waking
+    a poll group. The OS releases the lock when the leader dies; the followers
+    see their bus connection close, race for the lock, and the winner takes over.
+
+    When disabled the process is always the leader and nothing is shared.
+    """
+
+    def __init__(
+        self,
+        directory: str = ".coordination",
+        interval: float = 2.0,
+        enabled: bool = True,
+        max_buffer: int = 4 * 1024 * 1024
+    ):
+        self.directory = directory
+        self.interval = interval  # seconds between election attempts
+        self.enabled = enabled
+        self.max_buffer = max_buffer  # Bytes queued for a follower before it is dropped
+        self.lock_path = os.path.join(directory, "leader.lock")
+        self.socket_path = os.path.join(directory, "bus.sock")
+        self.lock_file = None
+        self.server = None
+        self.followers: List[asyncio.StreamWriter] = []
+        self.follower_ids = itertools.count(1)
+        self.connected = False  # Follower side: attached to the leader's bus
+        self.leader_writer: Optional[asyncio.StreamWriter] = None  # Follower side: our end of the bus
+        self.promote_listeners: List[Callable[[], Awaitable[None]]] = []
+        self.message_listeners: List[Callable[[Dict[str, Any]], Awaitable[None]]] = []
+        self.follower_listeners: List[Callable[[int, Dict[str, Any]], Awaitable[None]]] = []
+        self.snapshot: Optional[Callable[[], List[Dict[str, Any]]]] = None  # Messages sent to a new follower
+        self.report: Optional[Callable[[], Dict[str, Any]]] = None  # Follower state sent to the leader on change
+        self.last_report = None
+        self.stats = {
+            "published": 0, "received": 0, "sent_to_leader": 0, "received_from_followers": 0,
+            "dropped_followers": 0, "elections_won": 0
+        }
+
+    @property
+    def is_leader(self) -> bool:
+        return not self.enabled or self.lock_file is not None
+
+    def add_promote_listener(self, listener: Callable[[], Awaitable[None]]):
+        """Register a coroutine called when this process becomes the leader"""
+        self.promote_listeners.append(listener)
+
+    def add_message_listener(self, listener: Callable[[Dict[str, Any]], Awaitable[None]]):
+        """Register a coroutine called with every message a follower receives"""
+        self.message_listeners.append(listener)
+
+    def add_follower_listener(self, listener: Callable[[int, Dict[str, Any]], Awaitable[None]]):
+        """
+        Register a coroutine called on the leader as listener(follower id, message)
+        with every message a follower sends, and with {"type": "detach"} when it goes away
+        """
+        self.follower_listeners.append(listener)
+
+    async def run(self):
+        """Take part in the election until cancelled"""
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        while True:
+            try:
+                if not self.is_leader and self._try_lock():
+                    await self._promote()
+                elif not self.is_leader and not self.connected:
+                    await self._follow()
+                elif not self.is_leader:
+                    self.send_report()
+            except Exception as e:
+                logging.error(f"Error in worker coordination: {e}")
+            await asyncio.sleep(self.interval)
+
+    def _try_lock(self) -> bool:
+        lock_file = open(self.lock_path, "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        self.lock_file = lock_file
+        return True
+
+    async def _promote(self):
+        logging.info(f"Worker {os.getpid()} is now the leader")
+        self.stats["elections_won"] += 1
+
+        # A previous leader's socket file is left behind when it dies
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self.server = await asyncio.start_unix_server(self._accept, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+
+        for listener in self.promote_listeners:
+            try:
+                await listener()
+            except Exception as e:
+                logging.error(f"Error taking over as leader: {e}")
+
+    async def _accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Attach a follower, bring it up to date and hand its messages to the follower listeners"""
+        follower_id = next(self.follower_ids)
+        for message in (self.snapshot() if self.snapshot else []):
+            writer.write(self._frame(message))
+        self.followers.append(writer)
+        logging.info(f"Follower attached to the status bus, {len(self.followers)} in total")
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.stats["received_from_followers"] += 1
+                await self._notify_follower_listeners(follower_id, json.loads(line, object_hook=_decode))
+        except Exception as e:
+            logging.warning(f"Lost follower {follower_id} on the status bus: {e}")
+        finally:
+            if writer in self.followers:
+                self.followers.remove(writer)
+            writer.close()
+            await self._notify_follower_listeners(follower_id, {"type": "detach"})
+
+    async def _notify_follower_listeners(self, follower_id: int, message: Dict[str, Any]):
+        for listener in self.follower_listeners:
+            try:
+                await listener(follower_id, message)
+            except Exception as e:
+                logging.error(f"Error applying message from follower {follower_id}: {e}")
+
+    async def _follow(self):
+        try:
+            reader, writer = await asyncio.open_unix_connection(self.socket_path, limit=self.max_buffer)
+        except OSError:
+            return  # No leader yet, try again next round
+        self.connected = True
+        self.leader_writer = writer
+        self.last_report = None  # A new leader knows nothing about us yet
+        asyncio.create_task(self._receive(reader, writer))
+        logging.info(f"Worker {os.getpid()} follows the leader")
+        self.send_report()
+
+    async def _receive(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line, object_hook=_decode)
+                self.stats["received"] += 1
+                for listener in self.message_listeners:
+                    try:
+                        await listener(message)
+                    except Exception as e:
+                        logging.error(f"Error applying message from the leader: {e}")
+        except Exception as e:
+            logging.warning(f"Lost the status bus: {e}")
+        finally:
+            self.connected = False
+            self.leader_writer = None
+            writer.close()
+            logging.info("Leader went away, joining the next election")
+
+    @staticmethod
+    def _frame(message: Dict[str, Any]) -> bytes:
+        return json.dumps(message, default=_encode).encode() + b"\n"
+
+    def publish(self, message: Dict[str, Any]):
+        """Send a message to every follower without waiting, dropping those that fall behind"""
+        if not self.followers:
+            return
+        frame = self._frame(message)
+        self.stats["published"] += 1
+        for writer in list(self.followers):
+            if writer.transport.get_write_buffer_size() > self.max_buffer:
+                logging.warning("Dropping a follower that stopped reading the status bus")
+                self.stats["dropped_followers"] += 1
+                self.followers.remove(writer)
+                writer.close()
+                continue
+            writer.write(frame)
+
+    def send_to_leader(self, message: Dict[str, Any]) -> bool:
+        """Send a message to the leader without waiting, False when not attached or it stopped reading"""
+        writer = self.leader_writer
+        if writer is None or writer.transport.get_write_buffer_size() > self.max_buffer:
+            return False
+        writer.write(self._frame(message))
+        self.stats["sent_to_leader"] += 1
+        return True
+
+    def send_report(self):
+        """Send the follower's report to the leader if it changed since it was last sent"""
+        if not self.report or self.leader_writer is None:
+            return
+        report = self.report()
+        if report != self.last_report and self.send_to_leader(report):
+            self.last_report = report
+
+    async def close(self):
+        """Step down, releasing the lock and the bus"""
+        if self.server:
+            self.server.close()
+            for writer in self.followers:
+                writer.close()
+            self.followers = []
+            self.server = None
+        if self.lock_file:
+            fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+            self.lock_file.close()
+            self.lock_file = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "pid": os.getpid(),
+            "role": "leader" if self.is_leader else "follower",
+            "followers": len(self.followers),
+            "connected": self.connected,
+            **self.stats
+        }
@@ -0,0 +1,149 @@
+# services/delta_service.py
+import logging
+import uuid
+from typing import Dict, List, Any, Optional
+from datetime import datetime
+
+class DeltaService:
+    """Service for turning full status updates into versioned per-stage deltas"""
+
+    def __init__(self):
+        self.states = {}  # Dictionary of flow name to last broadcast state
+        self.epoch = uuid.uuid4().hex[:8]  # Versions are only comparable within one epoch
+
+    def update(
+        self,
+        flow_name: str,
+        stages: Dict[str, Dict],
+        timestamp: datetime,
+        partial: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Record a new status for a flow
+
+        Args:
+            partial: The stages are a subset (e.g. one source), missing stages are kept
+
+        Returns:
+            A delta message holding only the changed stages, or None if nothing changed
+        """
+        state = self.states.get(flow_name)
+        if state is None:
+            state = self.states[flow_name] = {
+                "version": 0,
+                "timestamp": None,
+                "stages": {},
+                "stage_versions": {},
+                "removed_versions": {}  # Removed stage names to the version that removed them
+            }
+
+        changed = {
+            stage_name: stage
+            for stage_name, stage in stages.items()
+            if state["stages"].get(stage_name) != stage
+        }
+        removed = [] if partial else [
+            stage_name for stage_name in state["stages"] if stage_name not in stages
+        ]
+
+        state["timestamp"] = timestamp
+        if not changed and not removed:
+            return None
+
+        base_version = state["version"]
+        state["version"] += 1
+        for stage_name, stage in changed.items():
+            state["stages"][stage_name] = stage
+            state["stage_versions"][stage_name] = state["version"]
+            state["removed_versions"].pop(stage_name, None)
+        for stage_name in removed:
+            del state["stages"][stage_name]
+            del state["stage_versions"][stage_name]
+            state["removed_versions"][stage_name] = state["version"]
+
+        logging.debug(f"Flow {flow_name} at version {state['version']}: {len(changed)} changed, {len(removed)} removed")
+        return {
+            "type": "delta",
+            "flowName": flow_name,
+            "epoch": self.epoch,
+            "version": state["version"],
+            "baseVersion": base_version,
+            "timestamp": timestamp,
+            "stages": changed,
+            "removed": removed
+        }
+
+    def snapshot(self, flow_name: str) -> Optional[Dict[str, Any]]:
+        """Full state of a flow, sent on connect or when a client reports a version gap"""
+        state = self.states.get(flow_name)
+        if state is None:
+            return None
+
+        return {
+            "type": "snapshot",
+            "flowName": flow_name,
+            "epoch": self.epoch,
+            "version": state["version"],
+            "timestamp": state["timestamp"],
+            "stages": state["stages"],
+            "stageVersions": state["stage_versions"]
+        }
+
+    def delta_since(
+        self,
+        flow_name: str,
+        version: Optional[int],
+        epoch: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Catch a client up from the version it last applied
+
+        Returns:
+            A delta from that version, a snapshot if the version cannot be
+            resumed (other epoch, unknown or ahead of ours), or None if the
+            flow has no state yet
+        """
+        state = self.states.get(flow_name)
+        if state is None:
+            return None
+        if version is None or epoch != self.epoch or not 0 <= version <= state["version"]:
+            return self.snapshot(flow_name)
+
+        return {
+            "type": "delta",
+            "flowName": flow_name,
+            "epoch": self.epoch,
+            "version": state["version"],
+            "baseVersion": version,
+            "timestamp": state["timestamp"],
+            "stages": {
+                stage_name: state["stages"][stage_name]
+                for stage_name, stage_version in state["stage_versions"].items()
+                if stage_version > version
+            },
+            "removed": [
+                stage_name
+                for stage_name, removed_version in state["removed_versions"].items()
+                if removed_version > version
+            ]
+        }
+
+    def get_version(self, flow_name: str) -> int:
+        """Current version of a flow, 0 if nothing was broadcast yet"""
+        state = self.states.get(flow_name)
+        return state["version"] if state else 0
+
+    def changed_since(self, flow_name: str, version: Optional[int]) -> Optional[List[str]]:
+        """Stages changed after the given version, None (meaning all) if unknown"""
+        state = self.states.get(flow_name)
+        if state is None or version is None:
+            return None
+        return [
+            stage_name
+            for stage_name, stage_version in state["stage_versions"].items()
+            if stage_version > version
+        ]
+
+    def remove_flow(self, flow_name: str) -> bool:
+        """Forget the broadcast state of a flow"""
+        return self.states.pop(flow_name, None) is not None
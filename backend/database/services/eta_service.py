@@ -0,0 +1,271 @@
+# services/eta_service.py
+import bisect
+import logging
+from collections import deque
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+from datetime import datetime, timedelta, timezone
+
+from models.flow_graph import FlowGraph
+from services.status_encoder import NAIVE_TIMEZONE
+
+class DurationStats:
+    """Rolling window of completed durations with percentiles kept sorted on insert"""
+
+    __slots__ = ("window", "sorted", "last_run")
+
+    def __init__(self, size: int):
+        self.window = deque(maxlen=size)
+        self.sorted: List[float] = []
+        self.last_run = None  # (start, end) of the last recorded run
+
+    def add(self, duration: float):
+        if len(self.window) == self.window.maxlen:
+            expired = self.window[0]
+            del self.sorted[bisect.bisect_left(self.sorted, expired)]
+        self.window.append(duration)
+        bisect.insort(self.sorted, duration)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.sorted:
+            return None
+        return self.sorted[min(int(q * len(self.sorted)), len(self.sorted) - 1)]
+
+class EtaService:
+    """
+    Service for predicting flow completion from historical stage durations
+
+    Each stage's remaining time is the longest path through its sub-stage DAG of
+    remaining sub-stage times (p50 of past durations, minus elapsed time while
+    running). The flow's remaining time and critical path come from the longest
+    path through the stage DAG. Only stages with changed or running sub-stages are
+    recomputed on each update; the stage-level pass is linear in the graph size.
+    """
+
+    def __init__(self, window: int = 50, default_duration: float = 300.0):
+        self.window = window  # Completed runs kept per stage
+        self.default_duration = default_duration  # seconds assumed without history
+        self.durations: Dict[Tuple[str, str], DurationStats] = {}
+        self.flows = {}  # Dictionary of flow name to incremental state and last estimate
+
+    def update(
+        self,
+        flow_name: str,
+        graph: FlowGraph,
+        stages: Dict[str, Dict],
+        changed: Optional[Iterable[str]] = None,
+        now: Optional[datetime] = None,
+        version: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Record finished stages and recompute the estimate of a flow
+
+        Args:
+            stages: Current stage status, as produced by StatusService
+            changed: Stage names whose status changed since the last update, None for all
+            version: Status version the stages correspond to, see get_version()
+        """
+        now = now or datetime.now(timezone.utc)
+        state = self.flows.get(flow_name)
+        if state is None or state["graph"] is not graph:
+            state = self.flows[flow_name] = {
+                "graph": graph,
+                "order": self._topological_order(graph),
+                "stage_remaining": {},
+                "running": set(),
+                "estimate": None,
+                "version": None
+            }
+            changed = None
+
+        names = stages.keys() if changed is None else changed
+        for name in names:
+            self._record(flow_name, name, stages.get(name))
+
+        # Stages to recompute: changed ones plus those with a running sub-stage
+        if changed is None:
+            dirty = set(state["order"])
+        else:
+            dirty = set(state["running"])
+            for name in changed:
+                dirty.update(graph.stages_of(name))
+
+        for stage_index in dirty:
+            remaining, chain, running = self._stage_remaining(flow_name, graph, stage_index, stages, now)
+            state["stage_remaining"][stage_index] = (remaining, chain)
+            if running:
+                state["running"].add(stage_index)
+            else:
+                state["running"].discard(stage_index)
+
+        state["estimate"] = self._estimate(flow_name, graph, state, now)
+        state["version"] = version
+        return state["estimate"]
+
+    def get_version(self, flow_name: str) -> Optional[int]:
+        """Status version of the last update, None if the flow was never estimated"""
+        state = self.flows.get(flow_name)
+        return state["version"] if state else None
+
+    def get_estimate(self, flow_name: str) -> Optional[Dict[str, Any]]:
+        """Last estimate of a flow"""
+        state = self.flows.get(flow_name)
+        return state["estimate"] if state else None
+
+    def remove_flow(self, flow_name: str) -> bool:
+        """Forget the estimate and duration history of a flow"""
+        for key in [key for key in self.durations if key[0] == flow_name]:
+            del self.durations[key]
+        return self.flows.pop(flow_name, None) is not None
+
+    def _record(self, flow_name: str, name: str, stage: Optional[Dict]):
+        """Add the duration of a completed stage run, once per run"""
+        if not stage or stage.get("status") != "completed":
+            return
+        start = self._as_datetime(stage.get("start_time"))
+        end = self._as_datetime(stage.get("end_time"))
+        if not start or not end or end < start:
+            return
+
+        stats = self.durations.get((flow_name, name))
+        if stats is None:
+            stats = self.durations[(flow_name, name)] = DurationStats(self.window)
+        if stats.last_run == (start, end):
+            return
+        stats.last_run = (start, end)
+        stats.add((end - start).total_seconds())
+
+    def _expected(self, flow_name: str, name: str) -> float:
+        stats = self.durations.get((flow_name, name))
+        expected = stats.percentile(0.5) if stats else None
+        return self.default_duration if expected is None else expected
+
+    def _remaining(self, flow_name: str, name: str, stage: Optional[Dict], now: datetime) -> Tuple[float, bool]:
+        """Remaining seconds of one sub-stage, and whether it is running"""
+        status = (stage or {}).get("status")
+        if status == "completed":
+            return 0.0, False
+
+        expected = self._expected(flow_name, name)
+        if status == "running":
+            start = self._as_datetime(stage.get("start_time"))
+            elapsed = (now - start).total_seconds() if start else 0.0
+            return max(expected - elapsed, 0.0), True
+
+        # Pending, failed (assumed rerun) or unknown
+        return expected, False
+
+    def _stage_remaining(
+        self,
+        flow_name: str,
+        graph: FlowGraph,
+        stage_index: int,
+        stages: Dict[str, Dict],
+        now: datetime
+    ) -> Tuple[float, List[str], bool]:
+        """Longest path through a stage's sub-stages, its chain and whether any is running"""
+        sub_stages = graph.sub_stages[stage_index]
+        if not sub_stages:
+            label = graph.labels[stage_index]
+            remaining, running = self._remaining(flow_name, label, stages.get(label), now)
+            return remaining, [label], running
+
+        # Sub-stage edges always point to a later position, so position order is topological
+        finish = [0.0] * len(sub_stages)
+        previous: List[Optional[int]] = [None] * len(sub_stages)
+        start = [0.0] * len(sub_stages)
+        any_running = False
+        for position, (_, name, _, successors) in enumerate(sub_stages):
+            remaining, running = self._remaining(flow_name, name, stages.get(name), now)
+            any_running = any_running or running
+            finish[position] = start[position] + remaining
+            for successor in successors:
+                if finish[position] >= start[successor]:
+                    start[successor] = finish[position]
+                    previous[successor] = position
+
+        last = max(range(len(sub_stages)), key=finish.__getitem__)
+        chain = []
+        position = last
+        while position is not None:
+            chain.append(sub_stages[position][1])
+            position = previous[position]
+        chain.reverse()
+        return finish[last], chain, any_running
+
+    def _estimate(self, flow_name: str, graph: FlowGraph, state: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+        """Longest path through the stage DAG"""
+        finish = {}
+        previous = {}
+        for stage_index in state["order"]:
+            remaining, _ = state["stage_remaining"].get(stage_index, (0.0, []))
+            start = 0.0
+            for predecessor in graph.predecessors[stage_index]:
+                if predecessor in finish and finish[predecessor] >= start:
+                    start = finish[predecessor]
+                    previous[stage_index] = predecessor
+            finish[stage_index] = start + remaining
+
+        if not finish:
+            return {
+                "flowName": flow_name,
+                "computed_at": now,
+                "remaining_seconds": 0.0,
+                "predicted_completion": now,
+                "critical_path": [],
+                "critical_sub_stages": [],
+                "stage_remaining": {}
+            }
+
+        last = max(finish, key=finish.get)
+        path = []
+        stage_index = last
+        while stage_index is not None:
+            path.append(stage_index)
+            stage_index = previous.get(stage_index)
+        path.reverse()
+
+        return {
+            "flowName": flow_name,
+            "computed_at": now,
+            "remaining_seconds": finish[last],
+            "predicted_completion": now + timedelta(seconds=finish[last]),
+            "critical_path": [graph.labels[index] for index in path],
+            "critical_sub_stages": [
+                name for index in path for name in state["stage_remaining"][index][1]
+            ],
+            "stage_remaining": {
+                graph.labels[index]: state["stage_remaining"][index][0] for index in state["order"]
+            }
+        }
+
+    @staticmethod
+    def _topological_order(graph: FlowGraph) -> List[int]:
+        """Stage node indexes in dependency order (Kahn's algorithm)"""
+        stage_indexes = [index for index, node_type in enumerate(graph.types) if node_type == "stage"]
+        in_degree = {index: len(graph.predecessors[index]) for index in stage_indexes}
+        ready = deque(index for index in stage_indexes if in_degree[index] == 0)
+        order = []
+        while ready:
+            index = ready.popleft()
+            order.append(index)
+            for successor in graph.successors[index]:
+                in_degree[successor] -= 1
+                if in_degree[successor] == 0:
+                    ready.append(successor)
+        if len(order) != len(stage_indexes):
+            logging.warning("Flow graph has a cycle, ETA ignores the stages on it")
+        return order
+
+    @staticmethod
+    def _as_datetime(value: Any) -> Optional[datetime]:
+        """Timezone-aware datetime of a database timestamp, naive ones read in NAIVE_TIMEZONE"""
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                return None
+        if not isinstance(value, datetime):
+            return None
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=NAIVE_TIMEZONE)
+        return value
@@ -1,8 +1,11 @@
 from typing import Dict, List, Any, Optional
 import os
 import json
+import hashlib
 import logging
 
+from models.flow_graph import FlowGraph
+
 class FlowService:
     """Service for managing flow definitions and their mappings"""
     
@@ -12,15 +15,16 @@ class FlowService:
     def add_flow(
         self, 
         name: str, 
-        flow_definition: Dict[str, Any], 
+        flow_graph: FlowGraph, 
         aws_mappings: Dict[str, str],
         onprem_mappings: Dict[str, Dict[str, int]],
         refresh_interval: int = 120
     ) -> None:
         """Add or update a flow definition"""
+        flow_graph.set_mappings({"aws": aws_mappings, "onPrem": onprem_mappings})
         self.flows[name] = {
             "name": name,
-            "definition": flow_definition,
+            "graph": flow_graph,
             "aws_mappings": aws_mappings,
             "onprem_mappings": onprem_mappings,
             "refresh_interval": refresh_interval
@@ -28,17 +32,48 @@ class FlowService:
         logging.info(f"Added flow: {name}")
     
     def get_flow(self, name: str) -> Optional[Dict[str, Any]]:
-        """Get a flow definition by name"""
-        return self.flows.get(name)
+        """
+        Get a flow definition by name, with the React Flow definition rendered from its graph
+        
+        The rendering is kept until the flow changes, so callers must not mutate it.
+        """
+        flow = self.flows.get(name)
+        if not flow:
+            return None
+        if "rendered" not in flow:
+            flow["rendered"] = {
+                "name": flow["name"],
+                "definition": flow["graph"].to_react_flow(),
+                "aws_mappings": flow["aws_mappings"],
+                "onprem_mappings": flow["onprem_mappings"],
+                "refresh_interval": flow["refresh_interval"]
+            }
+        return flow["rendered"]
+    
+    def get_etag(self, name: str) -> Optional[str]:
+        """Strong ETag of the rendered flow, a hash of its definition and mappings"""
+        flow = self.get_flow(name)
+        if flow is None:
+            return None
+        entry = self.flows[name]
+        if "etag" not in entry:
+            encoded = json.dumps(flow, sort_keys=True, default=str).encode()
+            entry["etag"] = f'"{hashlib.sha1(encoded).hexdigest()[:20]}"'
+        return entry["etag"]
+    
+    def get_graph(self, name: str) -> Optional[FlowGraph]:
+        """Get the compiled graph of a flow"""
+        flow = self.flows.get(name)
+        return flow["graph"] if flow else None
     
     def list_flows(self) -> List[Dict[str, Any]]:
         """List all available flows"""
         return [
             {
                 "name": name,
-                "nodeCount": len(flow["definition"]["nodes"]),
-                "edgeCount": len(flow["definition"]["edges"]),
-                "categoryCount": len(flow["definition"]["categories"])
+                "nodeCount": flow["graph"].node_count,
+                "edgeCount": flow["graph"].edge_count,
+                "categoryCount": len(flow["graph"].categories)
             }
             for name, flow in self.flows.items()
         ]
@@ -55,78 +90,213 @@ class FlowService:
         """Update the status of a stage in a flow"""
         if name not in self.flows:
             return False
-            
-        flow = self.flows[name]
-        nodes = flow["definition"]["nodes"]
         
-        # Find the stage node
-        for node in nodes:
-            if node["type"] == "stage" and node["data"]["label"] == stage_name:
-                node["data"]["status"] = status
-                logging.info(f"Updated status of {stage_name} in {name} to {status}")
-                return True
+        if self.flows[name]["graph"].set_status(stage_name, status):
+            self.flows[name].pop("rendered", None)
+            self.flows[name].pop("etag", None)
+            logging.info(f"Updated status of {stage_name} in {name} to {status}")
+            return True
                 
         return False
 
 # services/config_service.py
-import os
-import json
-import logging
-from typing import Dict, List, Any, Optional
+import time
+import asyncio
+from concurrent.futures import Executor
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Tuple
+
+import aiofiles
+import aiofiles.os
+
+from services.metrics import METRICS
+
+CONFIG_LOAD_SECONDS = METRICS.histogram("flowtracker_config_load_seconds", "Time to read and decode a config file")
 
 class ConfigService:
-    """Service for managing configuration files"""
+    """
+    Service for managing configuration files
     
-    def __init__(self, config_dir: str = "configs"):
+    All file system calls run on the given executor, so a slow mount never
+    blocks the event loop.
+    """
+    
+    def __init__(self, config_dir: str = "configs", executor: Optional[Executor] = None):
         self.config_dir = config_dir
+        self.executor = executor  # Thread pool for file I/O, None for the loop's default
         os.makedirs(config_dir, exist_ok=True)
+        self.cache = {}  # Dictionary of filename to {config, signature}
+        self.listeners = []  # Callbacks notified when a config file changes
+        self.invalid = {}  # Dictionary of filename to the signature of a file that failed to load
     
     async def save_config(self, filename: str, config: Dict[str, Any]) -> bool:
         """Save a configuration to file"""
         try:
             file_path = os.path.join(self.config_dir, filename)
-            with open(file_path, 'w') as f:
-                json.dump(config, f, indent=2)
+            async with aiofiles.open(file_path, 'w', executor=self.executor) as f:
+                await f.write(json.dumps(config, indent=2))
+            self.cache[filename] = {
+                "config": config,
+                "signature": await self._signature(file_path)
+            }
             logging.info(f"Saved configuration to {file_path}")
             return True
         except Exception as e:
             logging.error(f"Error saving configuration: {e}")
             return False
     
-    def load_config(self, filename: str) -> Optional[Dict[str, Any]]:
-        """Load a configuration from file"""
+    async def load_config(self, filename: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a configuration, served from memory once read
+        
+        The cache is invalidated by watch(), so callers must not mutate the
+        returned dict.
+        """
+        cached = self.cache.get(filename)
+        if cached:
+            return cached["config"]
+        
         try:
             file_path = os.path.join(self.config_dir, filename)
-            if not os.path.exists(file_path):
+            signature = await self._signature(file_path)
+            if signature is None:
                 return None
-                
-            with open(file_path, 'r') as f:
-                config = json.load(f)
+            
+            config = await self._read_config(file_path)
+            self.cache[filename] = {
+                "config": config,
+                "signature": signature
+            }
             return config
         except Exception as e:
             logging.error(f"Error loading configuration: {e}")
             return None
     
-    def list_configs(self) -> List[str]:
+    def get_etag(self, filename: str) -> Optional[str]:
+        """Strong ETag of a loaded config, a hash of its content, None if not loaded"""
+        cached = self.cache.get(filename)
+        if cached is None:
+            return None
+        if "etag" not in cached:
+            # Every change to a file replaces its cache entry, and with it the ETag
+            encoded = json.dumps(cached["config"], sort_keys=True).encode()
+            cached["etag"] = f'"{hashlib.sha1(encoded).hexdigest()[:20]}"'
+        return cached["etag"]
+    
+    async def list_configs(self) -> List[str]:
         """List all available configuration files"""
         try:
             return [
-                file for file in os.listdir(self.config_dir) 
+                file for file in await aiofiles.os.listdir(self.config_dir, executor=self.executor)
                 if file.endswith('.json')
             ]
         except Exception as e:
             logging.error(f"Error listing configurations: {e}")
             return []
     
-    def delete_config(self, filename: str) -> bool:
+    async def delete_config(self, filename: str) -> bool:
         """Delete a configuration file"""
         try:
             file_path = os.path.join(self.config_dir, filename)
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                logging.info(f"Deleted configuration: {file_path}")
-                return True
+            self.cache.pop(filename, None)
+            await aiofiles.os.remove(file_path, executor=self.executor)
+            logging.info(f"Deleted configuration: {file_path}")
+            return True
+        except FileNotFoundError:
             return False
         except Exception as e:
             logging.error(f"Error deleting configuration: {e}")
             return False
+    
+    def add_listener(self, listener: Callable[[str, Optional[Dict[str, Any]], Optional[Dict[str, Any]]], Awaitable[None]]):
+        """
+        Register a coroutine called as listener(filename, config, previous) when
+        a config is added, changes or is removed on disk; previous is None for a
+        new file, config is None if the file was removed
+        """
+        self.listeners.append(listener)
+    
+    async def watch(self, interval: float = 5.0):
+        """Poll the config directory and refresh cached configs whose file changed"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.check_for_changes()
+            except Exception as e:
+                logging.error(f"Error watching configurations: {e}")
+    
+    async def check_for_changes(self) -> List[str]:
+        """
+        Compare the mtime, inode and size of every cached config with the file on
+        disk, and load config files that appeared in the directory
+        
+        Returns:
+            Filenames whose config was added, reloaded or removed
+        """
+        changed = []
+        for filename, cached in list(self.cache.items()):
+            file_path = os.path.join(self.config_dir, filename)
+            signature = await self._signature(file_path)
+            if signature == cached["signature"]:
+                continue
+            
+            previous = cached["config"]
+            if signature is None:
+                config = None
+                del self.cache[filename]
+                logging.info(f"Configuration removed: {file_path}")
+            else:
+                try:
+                    config = await self._read_config(file_path)
+                except Exception as e:
+                    # Probably caught mid-write, retry on the next check
+                    logging.warning(f"Error reloading configuration {file_path}: {e}")
+                    continue
+                self.cache[filename] = {"config": config, "signature": signature}
+                logging.info(f"Configuration changed: {file_path}")
+            
+            changed.append(filename)
+            await self._notify(filename, config, previous)
+        
+        for filename in await self.list_configs():
+            if filename in self.cache:
+                continue
+            file_path = os.path.join(self.config_dir, filename)
+            signature = await self._signature(file_path)
+            if signature is None or self.invalid.get(filename) == signature:
+                continue
+            try:
+                config = await self._read_config(file_path)
+            except Exception as e:
+                # Skipped until the file changes again
+                logging.warning(f"Error loading new configuration {file_path}: {e}")
+                self.invalid[filename] = signature
+                continue
+            self.invalid.pop(filename, None)
+            self.cache[filename] = {"config": config, "signature": signature}
+            logging.info(f"Configuration added: {file_path}")
+            
+            changed.append(filename)
+            await self._notify(filename, config, None)
+        return changed
+    
+    async def _notify(self, filename: str, config: Optional[Dict[str, Any]], previous: Optional[Dict[str, Any]]):
+        for listener in self.listeners:
+            try:
+                await listener(filename, config, previous)
+            except Exception as e:
+                logging.error(f"Error handling change of configuration {filename}: {e}")
+    
+    async def _read_config(self, file_path: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        async with aiofiles.open(file_path, 'r', executor=self.executor) as f:
+            config = json.loads(await f.read())
+        CONFIG_LOAD_SECONDS.observe(time.perf_counter() - started)
+        return config
+    
+    async def _signature(self, file_path: str) -> Optional[Tuple[int, int, int]]:
+        """mtime, inode and size of a file, None if it does not exist"""
+        try:
+            stat = await aiofiles.os.stat(file_path, executor=self.executor)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_ino, stat.st_size)
@@ -0,0 +1,354 @@
+# services/history_service.py
+import asyncio
+import logging
+import sqlite3
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple, AsyncIterator
+from datetime import datetime, timedelta
+
+def to_epoch_ms(value: datetime) -> int:
+    # Rounded, so a bound one millisecond after a stored timestamp doesn't truncate onto it
+    return round(value.timestamp() * 1000)
+
+class HistoryService:
+    """
+    Append-only store of stage state transitions
+
+    Only transitions are kept: a row is written when a stage's status differs
+    from the last one recorded for it. Flow names, stage names and statuses are
+    interned to small integers and timestamps are stored as epoch milliseconds,
+    so a row is four integers. Rows are buffered in memory and written in
+    batches on a single dedicated thread, which also serves reads, so the
+    event loop never waits on SQLite.
+
+    With several workers only the leader writes; the others are read_only.
+    They open the file read-only and leave the schema to the leader, and track
+    the last states in memory like the leader, under local label ids that are
+    swapped for the leader's once it has written the labels.
+    """
+
+    SCHEMA = [
+        "PRAGMA auto_vacuum = INCREMENTAL",
+        "PRAGMA journal_mode = WAL",
+        """CREATE TABLE IF NOT EXISTS labels (
+            id INTEGER PRIMARY KEY,
+            kind INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            UNIQUE (kind, name)
+        )""",
+        """CREATE TABLE IF NOT EXISTS transitions (
+            flow INTEGER NOT NULL,
+            ts INTEGER NOT NULL,
+            stage INTEGER NOT NULL,
+            state INTEGER NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS transitions_flow_ts ON transitions (flow, ts)"
+    ]
+
+    # Label kinds
+    FLOW, STAGE, STATE = 0, 1, 2
+
+    def __init__(
+        self,
+        path: str = "history.db",
+        retention_days: float = 30.0,
+        batch_size: int = 500,
+        read_only: bool = False
+    ):
+        self.path = path
+        self.read_only = read_only  # Another process writes the history
+        self.retention = timedelta(days=retention_days)
+        self.batch_size = batch_size  # Buffered rows that trigger an early flush
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history")
+        self.conn = None
+        self.labels: Dict[Tuple[int, str], int] = {}  # (kind, name) to label id
+        self.names: Dict[int, str] = {}  # label id to name
+        self.last_states: Dict[Tuple[int, int], int] = {}  # (flow id, stage id) to last state id
+        self.last_transitions: Dict[int, Tuple[int, int, int]] = {}  # flow id to its latest (ts, stage id, state id)
+        self.next_label = 1
+        self.next_local_label = -1  # Ids of names a follower saw before the leader wrote them
+        self.pending: List[Tuple[int, int, int, int]] = []  # Rows not yet written
+        self.pending_labels: List[Tuple[int, int, str]] = []  # Labels not yet written
+        self.flush_event = asyncio.Event()
+
+    async def _run(self, func, *args):
+        """Run a database call on the history thread"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def open(self):
+        """Create the schema and load the labels and last state of every stage"""
+        await self._run(self._open)
+
+    def _open(self):
+        if self.read_only:
+            if self._follow():
+                self._load_states()
+        else:
+            self._connect_writer()
+            self._load_labels()
+            self._load_states()
+        logging.info(f"Opened status history {self.path} with {len(self.last_states)} tracked stages")
+
+    def _connect_writer(self):
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        for statement in self.SCHEMA:
+            self.conn.execute(statement)
+        self.conn.commit()
+
+    def _follow(self) -> bool:
+        """
+        Open the file read-only if needed and re-read the labels the leader wrote
+
+        Returns:
+            False while the leader has not created the history yet
+        """
+        try:
+            if self.conn is None:
+                uri = Path(self.path).absolute().as_uri() + "?mode=ro"
+                self.conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self._load_labels()
+            return True
+        except sqlite3.OperationalError as e:
+            logging.debug(f"Status history {self.path} not readable yet: {e}")
+            return False
+
+    async def promote(self):
+        """Take over writes: reopen the file for writing and re-read what the previous leader wrote"""
+        self.read_only = False
+        await self._run(self._promote)
+
+    def _promote(self):
+        if self.conn:
+            self.conn.close()
+        self._connect_writer()
+        self._load_labels()
+        self._load_states()
+
+    def _load_labels(self):
+        remap = {}  # Local label id to the id written by the leader
+        for label_id, kind, name in self.conn.execute("SELECT id, kind, name FROM labels"):
+            current = self.labels.get((kind, name))
+            if current is not None and current < 0:
+                remap[current] = label_id
+            self.labels[(kind, name)] = label_id
+            self.names[label_id] = name
+            self.next_label = max(self.next_label, label_id + 1)
+
+        if not self.read_only:
+            # Names only seen while following get real ids now that this process writes
+            for (kind, name), label_id in list(self.labels.items()):
+                if label_id < 0:
+                    remap[label_id] = self.labels[(kind, name)] = self.next_label
+                    self.names[self.next_label] = name
+                    self.pending_labels.append((self.next_label, kind, name))
+                    self.next_label += 1
+        if remap:
+            self._remap(remap)
+
+    def _remap(self, remap: Dict[int, int]):
+        for local_id in remap:
+            self.names.pop(local_id, None)
+        self.last_states = {
+            (remap.get(flow_id, flow_id), remap.get(stage_id, stage_id)): remap.get(state_id, state_id)
+            for (flow_id, stage_id), state_id in self.last_states.items()
+        }
+        self.last_transitions = {
+            remap.get(flow_id, flow_id): (ts, remap.get(stage_id, stage_id), remap.get(state_id, state_id))
+            for flow_id, (ts, stage_id, state_id) in self.last_transitions.items()
+        }
+
+    def _load_states(self):
+        # SQLite returns the row holding MAX(ts) for the bare columns
+        rows = self.conn.execute(
+            "SELECT flow, stage, state, MAX(ts) FROM transitions GROUP BY flow, stage"
+        )
+        for flow_id, stage_id, state_id, ts in rows:
+            # States a follower tracked in memory are at least as recent as the file
+            self.last_states.setdefault((flow_id, stage_id), state_id)
+            if ts >= self.last_transitions.get(flow_id, (-1,))[0]:
+                self.last_transitions[flow_id] = (ts, stage_id, state_id)
+
+    async def close(self):
+        """Write buffered rows and close the database"""
+        if self.conn:
+            await self.flush()
+            await self._run(self.conn.close)
+            self.conn = None
+        self.executor.shutdown(wait=False)
+
+    def _label(self, kind: int, name: str) -> int:
+        """Id of a name, interned on first use"""
+        label_id = self.labels.get((kind, name))
+        if label_id is None and self.read_only:
+            label_id = self.labels[(kind, name)] = self.next_local_label
+            self.next_local_label -= 1
+            self.names[label_id] = name
+        elif label_id is None:
+            # Ids are assigned here so the event loop never waits on an insert;
+            # the labels row is written with the next batch
+            label_id = self.labels[(kind, name)] = self.next_label
+            self.next_label += 1
+            self.names[label_id] = name
+            self.pending_labels.append((label_id, kind, name))
+        return label_id
+
+    def record(self, flow_name: str, stages: Dict[str, Dict], timestamp: datetime) -> int:
+        """
+        Buffer the transitions among the given stages
+
+        Args:
+            stages: Stage status, typically only the changed stages of a delta
+
+        Returns:
+            Number of transitions buffered, followers only track them in memory
+        """
+        flow_id = self._label(self.FLOW, flow_name)
+        ts = to_epoch_ms(timestamp)
+        count = 0
+        for stage_name, stage in stages.items():
+            stage_id = self._label(self.STAGE, stage_name)
+            state_id = self._label(self.STATE, (stage or {}).get("status") or "unknown")
+            if self.last_states.get((flow_id, stage_id)) == state_id:
+                continue
+            self.last_states[(flow_id, stage_id)] = state_id
+            self.last_transitions[flow_id] = (ts, stage_id, state_id)
+            if not self.read_only:
+                self.pending.append((flow_id, ts, stage_id, state_id))
+                count += 1
+
+        if len(self.pending) >= self.batch_size:
+            self.flush_event.set()
+        return count
+
+    def last_transition(self, flow_name: str) -> Optional[Dict[str, Any]]:
+        """Most recent transition of a flow, without touching the database"""
+        flow_id = self.labels.get((self.FLOW, flow_name))
+        if flow_id not in self.last_transitions:
+            return None
+        ts, stage_id, state_id = self.last_transitions[flow_id]
+        return {
+            "timestamp": datetime.fromtimestamp(ts / 1000),
+            "stage": self.names.get(stage_id),
+            "status": self.names.get(state_id)
+        }
+
+    async def flush(self) -> int:
+        """Write buffered rows in one transaction, returns the number of rows written"""
+        if self.read_only or not self.pending and not self.pending_labels:
+            return 0
+        rows, self.pending = self.pending, []
+        labels, self.pending_labels = self.pending_labels, []
+        try:
+            await self._run(self._write, labels, rows)
+        except Exception:
+            # Keep the rows for the next attempt
+            self.pending[:0] = rows
+            self.pending_labels[:0] = labels
+            raise
+        return len(rows)
+
+    def _write(self, labels: List[Tuple[int, int, str]], rows: List[Tuple[int, int, int, int]]):
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO labels (id, kind, name) VALUES (?, ?, ?)", labels)
+            self.conn.executemany("INSERT INTO transitions (flow, ts, stage, state) VALUES (?, ?, ?, ?)", rows)
+
+    async def run(self, flush_interval: float = 5.0, compact_interval: float = 3600.0):
+        """Flush buffered rows every flush_interval seconds, or early when the buffer is full"""
+        loop = asyncio.get_running_loop()
+        next_compaction = loop.time() + compact_interval
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_event.wait(), flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_event.clear()
+            try:
+                await self.flush()
+                if loop.time() >= next_compaction:
+                    await self.compact()
+                    next_compaction = loop.time() + compact_interval
+            except Exception as e:
+                logging.error(f"Error writing status history: {e}")
+
+    async def compact(self, now: Optional[datetime] = None) -> int:
+        """Delete transitions older than the retention period and release their pages"""
+        if self.read_only:
+            return 0
+        cutoff = to_epoch_ms((now or datetime.now()) - self.retention)
+        deleted = await self._run(self._compact, cutoff)
+        if deleted:
+            logging.info(f"Removed {deleted} status history rows older than {self.retention.days} days")
+        return deleted
+
+    def _compact(self, cutoff: int) -> int:
+        with self.conn:
+            deleted = self.conn.execute("DELETE FROM transitions WHERE ts < ?", (cutoff,)).rowcount
+        if deleted:
+            self.conn.execute("PRAGMA incremental_vacuum")
+        return deleted
+
+    async def query(
+        self,
+        flow_name: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        stage: Optional[str] = None,
+        page_size: int = 1000
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield the transitions of a flow in time order, reading page by page
+
+        Buffered rows are flushed first so they are included.
+        """
+        if self.read_only and not await self._run(self._follow):
+            return
+        flow_id = self.labels.get((self.FLOW, flow_name))
+        if flow_id is None:
+            return
+        stage_id = None
+        if stage is not None:
+            stage_id = self.labels.get((self.STAGE, stage))
+            if stage_id is None:
+                return
+
+        await self.flush()
+        start_ts = to_epoch_ms(start) if start else 0
+        end_ts = to_epoch_ms(end) if end else 2 ** 62
+        after = None  # First page starts at start_ts, later ones after the last (ts, rowid)
+        while True:
+            rows = await self._run(self._page, flow_id, stage_id, start_ts, after, end_ts, page_size)
+            for ts, _, row_stage, row_state in rows:
+                yield {
+                    "timestamp": datetime.fromtimestamp(ts / 1000),
+                    "stage": self.names.get(row_stage),
+                    "status": self.names.get(row_state)
+                }
+            if len(rows) < page_size:
+                return
+            after = (rows[-1][0], rows[-1][1])
+
+    def _page(
+        self,
+        flow_id: int,
+        stage_id: Optional[int],
+        start_ts: int,
+        after: Optional[Tuple[int, int]],
+        end_ts: int,
+        page_size: int
+    ) -> List[Tuple[int, int, int, int]]:
+        """One page of rows from start_ts, or after the (ts, rowid) key of the previous page"""
+        query = "SELECT ts, rowid, stage, state FROM transitions WHERE flow = ? AND ts <= ?"
+        params = [flow_id, end_ts]
+        if after is None:
+            query += " AND ts >= ?"
+            params.append(start_ts)
+        else:
+            query += " AND (ts > ? OR (ts = ? AND rowid > ?))"
+            params += [after[0], after[0], after[1]]
+        if stage_id is not None:
+            query += " AND stage = ?"
+            params.append(stage_id)
+        query += " ORDER BY ts, rowid LIMIT ?"
+        params.append(page_size)
+        return self.conn.execute(query, params).fetchall()
@@ -0,0 +1,52 @@
+# services/loop_monitor.py
+import asyncio
+import logging
+import time
+from typing import Dict, Any
+
+class LoopMonitor:
+    """
+    Measures event loop lag
+
+    A task sleeps for a fixed interval and records how late it wakes up. The
+    overshoot is the time the loop spent on other callbacks that did not yield,
+    which is what stalls HTTP responses and WebSocket pings.
+    """
+
+    def __init__(self, interval: float = 0.5, threshold_ms: float = 100.0):
+        self.interval = interval  # seconds between samples
+        self.threshold_ms = threshold_ms  # Lag logged as a blocked loop
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.total_lag_ms = 0.0
+        self.samples = 0
+        self.blocked = 0  # Samples over the threshold
+
+    async def run(self):
+        """Sample the loop lag until cancelled"""
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.record((loop.time() - started - self.interval) * 1000)
+
+    def record(self, lag_ms: float):
+        lag_ms = max(lag_ms, 0.0)
+        self.last_lag_ms = lag_ms
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        self.total_lag_ms += lag_ms
+        self.samples += 1
+        if lag_ms > self.threshold_ms:
+            self.blocked += 1
+            logging.warning(f"Event loop blocked for {lag_ms:.0f} ms")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "lag_ms": round(self.last_lag_ms, 3),
+            "max_lag_ms": round(self.max_lag_ms, 3),
+            "mean_lag_ms": round(self.total_lag_ms / self.samples, 3) if self.samples else 0.0,
+            "samples": self.samples,
+            "blocked": self.blocked,
+            "threshold_ms": self.threshold_ms,
+            "sampled_at": time.time()
+        }
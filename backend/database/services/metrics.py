@@ -0,0 +1,168 @@
+# services/metrics.py
+import bisect
+import math
+from typing import Dict, List, Any, Tuple, Callable, Iterable
+
+# Latency buckets in seconds, from sub-millisecond callbacks to slow queries
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# A collector returns (name, type, help, [(labels, value)]) tuples at scrape time
+Sample = Tuple[Dict[str, str], float]
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]
+
+class Metric:
+    """A named metric with fixed label names, values are kept per label values"""
+
+    type_name = "untyped"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, label_values: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(label_values.get(label, "")) for label in self.labels)
+
+    def remove(self, **label_values):
+        """Forget the series of the given label values, e.g. of a removed flow"""
+        self.values.pop(self._key(label_values), None)
+
+    def samples(self) -> List[Tuple[str, Tuple[str, ...], float]]:
+        return [(self.name, key, value) for key, value in self.values.items()]
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def inc(self, amount: float = 1.0, **label_values):
+        if not self.registry.enabled:
+            return
+        key = self._key(label_values)
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+class Gauge(Metric):
+    type_name = "gauge"
+
+    def set(self, value: float, **label_values):
+        if not self.registry.enabled:
+            return
+        self.values[self._key(label_values)] = value
+
+class Histogram(Metric):
+    """Bucketed observations; each observe() updates one bucket, cumulated at scrape time"""
+
+    type_name = "histogram"
+
+    def __init__(self, registry, name, help_text, labels=(), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(registry, name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **label_values):
+        if not self.registry.enabled:
+            return
+        key = self._key(label_values)
+        series = self.values.get(key)
+        if series is None:
+            # Bucket counts (the last is +Inf), sum, count
+            series = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self) -> List[Tuple[str, Tuple[str, ...], float]]:
+        samples = []
+        for key, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", key + (_format_value(bound),), cumulative))
+            samples.append((f"{self.name}_sum", key, total))
+            samples.append((f"{self.name}_count", key, count))
+        return samples
+
+class MetricsRegistry:
+    """
+    In-process metrics in the Prometheus text format
+
+    Hot paths update plain dicts; when disabled every update returns on its
+    first line. Values that already live elsewhere (client counts, pool sizes)
+    are read by collectors at scrape time instead of being mirrored.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: List[Collector] = []
+
+    def _register(self, metric: Metric) -> Metric:
+        # Modules may be imported more than once (tests, reloads), reuse the metric
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(self, name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(self, name, help_text, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(self, name, help_text, labels, buckets))
+
+    def add_collector(self, collector: Collector):
+        """Register a callable producing samples at scrape time"""
+        self.collectors.append(collector)
+
+    def remove_labels(self, label: str, value: str):
+        """Drop every series with the given label value, e.g. flow=<removed flow>"""
+        for metric in self.metrics.values():
+            if label in metric.labels:
+                index = metric.labels.index(label)
+                for key in [key for key in metric.values if key[index] == value]:
+                    del metric.values[key]
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            label_names = metric.labels + (("le",) if isinstance(metric, Histogram) else ())
+            for sample_name, key, value in metric.samples():
+                lines.append(f"{sample_name}{_format_labels(label_names[:len(key)], key)} {_format_value(value)}")
+
+        for collector in self.collectors:
+            for name, type_name, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {type_name}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    escaped = (
+        str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        for value in values
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+# Registry shared by the whole process
+METRICS = MetricsRegistry()
@@ -0,0 +1,199 @@
+# services/poll_scheduler.py
+import asyncio
+import logging
+import random
+from typing import Dict, List, Any, Optional, Tuple, Callable, Awaitable
+
+from database.status_source import resolve_sources
+from services.status_service import StatusService
+
+class PollScheduler:
+    """
+    Groups flows that share database connections so each group is polled once per tick
+
+    The cadence of a group adapts to its flows: it polls every active_interval
+    seconds while a watched flow has running stages, at the configured refresh
+    interval otherwise, and backs off by idle_factor when nothing is running and
+    again when nobody is subscribed. Each interval is jittered so groups sharing
+    a database spread out.
+    """
+
+    def __init__(
+        self,
+        status_service: StatusService,
+        active_interval: float = 10.0,
+        idle_factor: float = 4.0,
+        max_interval: float = 900.0,
+        jitter: float = 0.1
+    ):
+        self.status_service = status_service
+        self.active_interval = active_interval  # seconds while stages are running
+        self.idle_factor = idle_factor  # Backoff when idle or unwatched
+        self.max_interval = max_interval  # seconds
+        self.jitter = jitter  # Fraction of the interval added or removed at random
+        self.groups = {}  # Dictionary of group key to group definition
+        self.flow_groups = {}  # Mapping of flow name to group key
+        self.wake_events: Dict[str, asyncio.Event] = {}  # Cuts a group's wait short
+
+    @staticmethod
+    def group_key(sources: Dict[str, Dict[str, Any]]) -> str:
+        """Build the group key from the source names and connector keys of a flow"""
+        return "|".join(f"{name}={source['key']}" for name, source in sorted(sources.items()))
+
+    def register_flow(
+        self,
+        flow_name: str,
+        databases: Dict[str, Dict[str, Any]],
+        stage_mappings: Dict[str, Dict[str, Any]],
+        refresh_interval: int = 120
+    ) -> Tuple[str, bool]:
+        """
+        Add or update a flow in its database group
+
+        Returns:
+            Tuple of the group key and whether the group was newly created
+        """
+        sources = resolve_sources(databases, stage_mappings)
+        group_key = self.group_key(sources)
+
+        # A flow whose databases changed moves to another group
+        if self.flow_groups.get(flow_name) not in (None, group_key):
+            self.unregister_flow(flow_name)
+
+        created = group_key not in self.groups
+        if created:
+            self.groups[group_key] = {"flows": {}}
+
+        # The key leaves out credentials, timeout and pool options, so a reloaded
+        # config that changes them lands in the same group and replaces them
+        self.groups[group_key]["sources"] = {
+            name: {
+                "type": source["type"],
+                "params": source["params"],
+                "timeout": source["timeout"],
+                "pool": source["pool"]
+            }
+            for name, source in sources.items()
+        }
+
+        self.groups[group_key]["flows"][flow_name] = {
+            "mappings": {name: source["mappings"] for name, source in sources.items()},
+            "refresh_interval": refresh_interval
+        }
+        self.flow_groups[flow_name] = group_key
+        logging.info(f"Registered flow {flow_name} in poll group {group_key}")
+        return group_key, created
+
+    def unregister_flow(self, flow_name: str) -> bool:
+        """Remove a flow from its group, dropping the group once it is empty"""
+        group_key = self.flow_groups.pop(flow_name, None)
+        if group_key is None:
+            return False
+
+        group = self.groups.get(group_key)
+        if group:
+            group["flows"].pop(flow_name, None)
+            if not group["flows"]:
+                del self.groups[group_key]
+
+                # Let the group's updater notice right away and stop
+                event = self.wake_events.pop(group_key, None)
+                if event:
+                    event.set()
+        return True
+
+    def get_group(self, group_key: str) -> Optional[Dict[str, Any]]:
+        """Get a group definition by key"""
+        return self.groups.get(group_key)
+
+    def list_groups(self) -> List[str]:
+        """List all group keys"""
+        return list(self.groups.keys())
+
+    def refresh_interval(self, group_key: str) -> int:
+        """A group is polled as often as its most demanding flow requires"""
+        group = self.groups.get(group_key)
+        if not group or not group["flows"]:
+            return 120
+        return min(flow["refresh_interval"] for flow in group["flows"].values())
+
+    def next_interval(self, group_key: str, group_status: Dict[str, Dict[str, Any]], watched: bool) -> float:
+        """
+        Seconds until a group's next poll, from the status it just returned
+
+        Args:
+            watched: Whether any flow of the group has subscribers
+        """
+        interval = float(self.refresh_interval(group_key))
+        running = any(
+            (stage or {}).get("status") == "running"
+            for stages in group_status.values()
+            for stage in stages.values()
+        )
+
+        if running and watched:
+            interval = min(self.active_interval, interval)
+        else:
+            if not running:
+                interval *= self.idle_factor
+            if not watched:
+                interval *= self.idle_factor
+        interval = min(interval, self.max_interval)
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def wake(self, group_key: str):
+        """Poll a group now instead of at its next deadline, e.g. when a client subscribes"""
+        event = self.wake_events.get(group_key)
+        if event:
+            event.set()
+
+    async def wait(self, group_key: str, delay: float) -> bool:
+        """
+        Sleep until a group's next poll is due or it is woken
+
+        Returns:
+            True if the group was woken early
+        """
+        event = self.wake_events.setdefault(group_key, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), max(delay, 0.0))
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            event.clear()
+
+    async def poll_group(
+        self,
+        group_key: str,
+        on_partial: Optional[Callable[[str, Dict[str, Dict[str, Any]]], Awaitable[None]]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Poll every source of the group once for all of its flows
+
+        Args:
+            on_partial: Passed to StatusService.get_group_status to publish each
+                source's stages as soon as it is done
+
+        Returns:
+            Dict mapping flow names to stage status
+        """
+        group = self.groups.get(group_key)
+        if not group:
+            return {}
+
+        # Sources are connected inside the concurrent fetch, under their own timeouts
+        sources = {
+            name: {"type": source["type"], "params": source["params"], "pool": source["pool"]}
+            for name, source in group["sources"].items()
+        }
+
+        timeouts = {
+            name: source["timeout"]
+            for name, source in group["sources"].items()
+            if source["timeout"]
+        }
+
+        # Copy so flows registered mid-poll don't change the dict being iterated
+        flows = {flow_name: flow["mappings"] for flow_name, flow in group["flows"].items()}
+        return await self.status_service.get_group_status(sources, flows, on_partial, timeouts)
@@ -0,0 +1,107 @@
+# services/poller_supervisor.py
+import asyncio
+import logging
+import time
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+class PollerSupervisor:
+    """
+    Owns one background task per poll group
+
+    Starting a key that already has a live task is a no-op, so reloading a
+    config never spawns a second poller. A task that raises is restarted with
+    exponential backoff; one that returns (its group is gone) is finished.
+    """
+
+    def __init__(self, restart_backoff: float = 1.0, max_backoff: float = 60.0):
+        self.restart_backoff = restart_backoff  # seconds before the first restart
+        self.max_backoff = max_backoff  # seconds
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.states: Dict[str, Dict[str, Any]] = {}  # Lifecycle and run stats per key
+
+    def start(self, key: str, func: Callable[..., Awaitable[None]], *args) -> bool:
+        """
+        Run func(*args) under supervision unless key already has a live task
+
+        Returns:
+            True if a task was started
+        """
+        task = self.tasks.get(key)
+        if task and not task.done():
+            return False
+
+        self.states[key] = {
+            "state": "running",
+            "started_at": time.time(),
+            "restarts": 0,
+            "errors": 0,
+            "runs": 0,
+            "last_run": None,
+            "last_duration": None,
+            "last_error": None
+        }
+        self.tasks[key] = asyncio.create_task(self._supervise(key, func, args), name=f"poller:{key}")
+        logging.info(f"Started poller {key}")
+        return True
+
+    async def _supervise(self, key: str, func: Callable[..., Awaitable[None]], args: tuple):
+        state = self.states[key]
+        backoff = self.restart_backoff
+        while True:
+            started = time.monotonic()
+            try:
+                state["state"] = "running"
+                await func(*args)
+                state["state"] = "finished"
+                logging.info(f"Poller {key} finished")
+                return
+            except asyncio.CancelledError:
+                state["state"] = "stopped"
+                raise
+            except Exception as e:
+                state["errors"] += 1
+                state["last_error"] = str(e)
+                state["state"] = "backoff"
+
+                # A poller that ran for a while before failing starts over from the base delay
+                if time.monotonic() - started > self.max_backoff:
+                    backoff = self.restart_backoff
+                logging.error(f"Poller {key} crashed, restarting in {backoff:.1f}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                state["restarts"] += 1
+
+    def record_run(self, key: str, duration: float, error: Optional[str] = None):
+        """Called by a poller after each poll"""
+        state = self.states.get(key)
+        if state is None:
+            return
+        state["runs"] += 1
+        state["last_run"] = time.time()
+        state["last_duration"] = round(duration, 3)
+        if error is not None:
+            state["errors"] += 1
+            state["last_error"] = error
+
+    async def stop(self, key: str) -> bool:
+        """Cancel the task of a key and wait for it to end"""
+        task = self.tasks.pop(key, None)
+        self.states.pop(key, None)
+        if task is None:
+            return False
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        logging.info(f"Stopped poller {key}")
+        return True
+
+    async def stop_all(self):
+        """Cancel every task, on shutdown"""
+        await asyncio.gather(*(self.stop(key) for key in list(self.tasks)))
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Lifecycle state and run stats per key, finished pollers are dropped"""
+        for key, task in list(self.tasks.items()):
+            if task.done():
+                del self.tasks[key]
+                self.states.pop(key, None)
+        return {key: dict(state) for key, state in self.states.items()}
@@ -0,0 +1,94 @@
+# services/status_cache.py
+import asyncio
+import logging
+import time
+import uuid
+from typing import Dict, Any, Optional, Callable, Awaitable
+from datetime import datetime
+
+class StatusCache:
+    """
+    Latest status snapshot per flow, with single-flight refreshes
+
+    Every snapshot carries a version that only changes when the status does,
+    unique across flows within the cache's epoch, for use in ETags.
+    """
+
+    def __init__(self, ttl: float = 30.0):
+        self.ttl = ttl  # seconds a snapshot is served without refreshing
+        self.entries = {}  # Dictionary of flow name to {status, as_of, stored_at, version}
+        self.inflight: Dict[str, asyncio.Task] = {}  # Refreshes in progress by key
+        self.epoch = uuid.uuid4().hex[:8]
+        self.last_version = 0
+
+    def put(self, flow_name: str, status: Dict[str, Any], as_of: datetime):
+        """Store the status produced by the poller or a refresh"""
+        previous = self.entries.get(flow_name)
+        if previous and previous["status"] == status:
+            version = previous["version"]
+        else:
+            self.last_version += 1
+            version = self.last_version
+        self.entries[flow_name] = {
+            "status": status,
+            "as_of": as_of,
+            "stored_at": time.monotonic(),
+            "version": version
+        }
+
+    def get(self, flow_name: str, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get the cached snapshot of a flow if it is not older than max_age seconds
+
+        Returns:
+            Dict with status, as_of, age and version, or None if missing or too old
+        """
+        entry = self.entries.get(flow_name)
+        if not entry:
+            return None
+
+        age = time.monotonic() - entry["stored_at"]
+        if age > (self.ttl if max_age is None else max_age):
+            return None
+
+        return {
+            "status": entry["status"],
+            "as_of": entry["as_of"],
+            "age": age,
+            "version": entry["version"]
+        }
+
+    async def get_or_fetch(
+        self,
+        flow_name: str,
+        refresh: Callable[[], Awaitable[None]],
+        key: Optional[str] = None,
+        max_age: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get the snapshot of a flow, refreshing it when missing or too old
+
+        Concurrent callers sharing a key wait on the same refresh, so N requests
+        trigger at most one database query. The refresh is expected to put() the
+        status of the flow (and of any other flow it polls).
+        """
+        cached = self.get(flow_name, max_age)
+        if cached:
+            return cached
+
+        key = key or flow_name
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(refresh())
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        else:
+            logging.debug(f"Joining in-flight status refresh for {key}")
+
+        # Shield so a cancelled request doesn't cancel the refresh shared with others
+        await asyncio.shield(task)
+        return self.get(flow_name, float("inf"))
+
+    def remove_flow(self, flow_name: str) -> bool:
+        """Forget the snapshot of a flow"""
+        return self.entries.pop(flow_name, None) is not None
@@ -0,0 +1,194 @@
+# services/status_encoder.py
+import json
+import logging
+from typing import Dict, List, Any, Optional, Tuple, Union, Callable
+from datetime import datetime, timezone
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Integer codes of the trimmed stage schema, statuses without a code are sent as strings
+STATE_CODES = {
+    "pending": 0,
+    "running": 1,
+    "completed": 2,
+    "failed": 3,
+    "error": 4,
+    "not_found": 5,
+    "unknown": 6
+}
+
+# Timezone of the naive datetimes aiomysql and oracledb return. Airflow stores UTC; set
+# this to the zone of the status databases if they store another, so that epoch values
+# of the compact formats agree with the ISO strings of the JSON format
+NAIVE_TIMEZONE = timezone.utc
+
+def to_epoch_ms(value: Any) -> Any:
+    """Epoch milliseconds of a datetime or ISO string, other values unchanged"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=NAIVE_TIMEZONE)
+        return int(value.timestamp() * 1000)
+    return value
+
+def compact_stage(stage: Dict[str, Any], details: bool = False) -> Dict[str, Any]:
+    """
+    Trimmed form of a stage: {"s": state code, "t0": start ms, "t1": end ms}
+
+    The raw database row in "details" is only kept when asked for.
+    """
+    status = stage.get("status")
+    compact = {"s": STATE_CODES.get(status, status)}
+    if stage.get("start_time") is not None:
+        compact["t0"] = to_epoch_ms(stage["start_time"])
+    if stage.get("end_time") is not None:
+        compact["t1"] = to_epoch_ms(stage["end_time"])
+    if details and stage.get("details"):
+        compact["d"] = stage["details"]
+    return compact
+
+def compact_message(message: Dict[str, Any], details: bool = False) -> Dict[str, Any]:
+    """Trimmed form of a snapshot, delta or status response"""
+    compact = dict(message)
+    for key in ("stages", "status"):
+        stages = message.get(key)
+        if isinstance(stages, dict) and all(isinstance(stage, dict) for stage in stages.values()):
+            compact[key] = {name: compact_stage(stage, details) for name, stage in stages.items()}
+    for key in ("timestamp", "as_of"):
+        if key in compact:
+            compact[key] = to_epoch_ms(compact[key])
+
+    # Bulk responses hold one such message per flow
+    flows = message.get("flows")
+    if isinstance(flows, dict):
+        compact["flows"] = {
+            name: compact_message(flow, details) if isinstance(flow, dict) else flow
+            for name, flow in flows.items()
+        }
+    return compact
+
+class StatusEncoder:
+    """One wire format for status messages"""
+
+    def __init__(
+        self,
+        name: str,
+        media_type: str,
+        dumps: Callable[[Any], Union[str, bytes]],
+        compact: bool = False
+    ):
+        self.name = name
+        self.media_type = media_type
+        self.dumps = dumps
+        self.compact = compact  # Use the trimmed stage schema
+
+    @property
+    def subprotocol(self) -> str:
+        return f"status.{self.name}"
+
+    def encode(self, message: Dict[str, Any], details: bool = False) -> Union[str, bytes]:
+        if self.compact:
+            message = compact_message(message, details)
+        return self.dumps(message)
+
+def _stdlib_dumps(message: Any) -> str:
+    return json.dumps(message, default=str)
+
+def _orjson_dumps(message: Any) -> str:
+    # Text frames, so decode; non-str keys and unknown types still work
+    return orjson.dumps(message, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+def _msgpack_dumps(message: Any) -> bytes:
+    return msgpack.packb(message, default=str, datetime=False)
+
+ENCODERS: Dict[str, StatusEncoder] = {
+    # The original format, kept byte for byte for existing clients
+    "json": StatusEncoder("json", "application/json", _stdlib_dumps)
+}
+if orjson is not None:
+    ENCODERS["orjson"] = StatusEncoder("orjson", "application/json", _orjson_dumps)
+ENCODERS["compact"] = StatusEncoder(
+    "compact",
+    "application/vnd.flowtracker.compact+json",
+    _orjson_dumps if orjson is not None else _stdlib_dumps,
+    compact=True
+)
+if msgpack is not None:
+    ENCODERS["msgpack"] = StatusEncoder("msgpack", "application/msgpack", _msgpack_dumps, compact=True)
+else:
+    logging.info("msgpack is not installed, the msgpack wire format is disabled")
+
+DEFAULT_ENCODER = ENCODERS["json"]
+
+class EventStreamEncoder(StatusEncoder):
+    """
+    Frames the messages of a text encoder as Server-Sent Events
+
+    Versioned messages get an "<epoch>:<version>" event id, which browsers
+    send back as Last-Event-ID when they reconnect.
+    """
+
+    def __init__(self, base: StatusEncoder):
+        super().__init__(f"sse.{base.name}", "text/event-stream", base.dumps, base.compact)
+
+    def encode(self, message: Dict[str, Any], details: bool = False) -> str:
+        # JSON escapes newlines, so the data always fits on one line
+        frame = f"data: {super().encode(message, details)}\n\n"
+        if "epoch" in message and "version" in message:
+            frame = f"id: {message['epoch']}:{message['version']}\n" + frame
+        return frame
+
+# Binary formats can't be carried in an event stream
+EVENT_STREAM_ENCODERS: Dict[str, EventStreamEncoder] = {
+    name: EventStreamEncoder(encoder) for name, encoder in ENCODERS.items() if name != "msgpack"
+}
+
+def negotiate_subprotocol(requested: List[str]) -> Tuple[Optional[str], StatusEncoder]:
+    """Pick the first requested WebSocket subprotocol we support, JSON otherwise"""
+    for subprotocol in requested:
+        for encoder in ENCODERS.values():
+            if encoder.subprotocol == subprotocol.strip():
+                return subprotocol.strip(), encoder
+    return None, DEFAULT_ENCODER
+
+def negotiate_accept(accept: Optional[str]) -> Optional[StatusEncoder]:
+    """
+    Encoder for an HTTP Accept header, or None to use the default response
+
+    Only media types we add over plain JSON are matched, highest q first.
+    """
+    if not accept:
+        return None
+
+    candidates = []
+    for position, item in enumerate(accept.split(",")):
+        media_type, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        candidates.append((-quality, position, media_type.strip()))
+
+    for _, _, media_type in sorted(candidates):
+        for encoder in ENCODERS.values():
+            if encoder.compact and encoder.media_type == media_type:
+                return encoder
+        if media_type in ("application/json", "*/*"):
+            return None
+    return None
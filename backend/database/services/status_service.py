@@ -1,135 +1,283 @@
 # services/status_service.py
+import asyncio
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Dict, Optional, Any, Callable, Awaitable, Union
 import time
 from datetime import datetime
 
+from database.status_source import StatusSource, DEFAULT_POOL_OPTIONS, get_source_type
 from database.aws_connector import AWSConnector
 from database.oracle_connector import OracleConnector
+from services.metrics import METRICS
+
+# Built-in sources, registered by their register_source decorator on import
+BUILTIN_SOURCES = (AWSConnector, OracleConnector)
+
+SOURCE_QUERY_SECONDS = METRICS.histogram(
+    "flowtracker_source_query_seconds", "Status query latency per source", ("source", "type")
+)
+SOURCE_ERRORS = METRICS.counter(
+    "flowtracker_source_errors_total", "Failed or timed out status queries per source", ("source", "type")
+)
+
+# Stage statuses from worst to best, unlisted statuses rank after "unknown"
+STATUS_SEVERITY = ["failed", "error", "not_found", "unknown", "running", "pending", "completed"]
 
 class StatusService:
     """Service for retrieving status information from various data sources"""
-    
-    def __init__(self):
-        self.aws_connectors = {}  # Cache of AWS connectors
-        self.oracle_connectors = {}  # Cache of Oracle connectors
-    
-    async def get_aws_connector(self, host: str, user: str, password: str, database: str) -> AWSConnector:
-        """Get or create an AWS connector for the given connection parameters"""
-        connector_key = f"{host}:{database}:{user}"
-        
-        if connector_key not in self.aws_connectors:
-            connector = AWSConnector(host, user, password, database)
-            await connector.connect()
-            self.aws_connectors[connector_key] = connector
-            
-        return self.aws_connectors[connector_key]
-    
-    async def get_oracle_connector(self, host: str, user: str, password: str, service: str) -> OracleConnector:
-        """Get or create an Oracle connector for the given connection parameters"""
-        connector_key = f"{host}:{service}:{user}"
-        
-        if connector_key not in self.oracle_connectors:
-            connector = OracleConnector(host, user, password, service)
-            await connector.connect()
-            self.oracle_connectors[connector_key] = connector
-            
-        return self.oracle_connectors[connector_key]
-    
+
+    def __init__(
+        self,
+        timeouts: Optional[Dict[str, float]] = None,
+        default_timeout: float = 30.0,
+        pool_options: Optional[Dict[str, Any]] = None,
+        max_failures: int = 3
+    ):
+        self.sources: Dict[str, StatusSource] = {}  # Cache of sources by type and connector key
+        self.locks: Dict[str, asyncio.Lock] = {}  # Guards creation and rebuild per source key
+        self.timeouts = timeouts or {}  # seconds per source type
+        self.default_timeout = default_timeout
+        self.pool_options = {**DEFAULT_POOL_OPTIONS, **(pool_options or {})}
+        self.max_failures = max_failures  # Consecutive failures before a pool is rebuilt
+        self.failures: Dict[str, int] = {}  # Consecutive failures per source key
+        self.source_stats = {}  # Last latency/outcome per source connector
+
+    async def get_source(
+        self,
+        type_name: str,
+        params: Dict[str, Any],
+        pool_options: Optional[Dict[str, Any]] = None
+    ) -> StatusSource:
+        """
+        Get or create a source of the given type for its connection parameters
+
+        Creation is serialized per source key, so concurrent callers share one pool.
+        The connector key leaves out credentials and other settings: a cached source
+        created from other params is closed and replaced, and one whose pool options
+        differ has its pool rebuilt with the new options.
+        """
+        source_type = get_source_type(type_name)
+        source_key = self.source_key(type_name, params)
+        options = {**self.pool_options, **(pool_options or {})}
+
+        source = self.sources.get(source_key)
+        if source and source.params == params and source.pool_options == options:
+            return source
+
+        async with self.locks.setdefault(source_key, asyncio.Lock()):
+            # Another caller may have created or rebuilt it while we waited
+            source = self.sources.get(source_key)
+            if source is None or source.params != params:
+                previous = source
+                source = source_type.from_config(params)
+                source.source_key = source_key
+                source.params = dict(params)
+                source.pool_options = options
+                await source.connect()
+                self.sources[source_key] = source
+
+                if previous is not None:
+                    logging.warning(f"Connection settings of {source_key} changed, replaced its source")
+                    # Keep the rows counter monotonic across the replacement
+                    source.rows_fetched = previous.rows_fetched
+                    self.failures[source_key] = 0
+                    try:
+                        await previous.close()
+                    except Exception as e:
+                        logging.warning(f"Error closing replaced source {source_key}: {e}")
+            elif source.pool_options != options:
+                logging.warning(f"Pool options of {source_key} changed, rebuilding its pool")
+                source.pool_options = options
+                await source.rebuild()
+                self.failures[source_key] = 0
+
+        return source
+
+    @staticmethod
+    def source_key(type_name: str, params: Dict[str, Any]) -> str:
+        """Key under which the source of a database config is cached"""
+        return f"{type_name}:{get_source_type(type_name).connector_key(params)}"
+
+    async def record_outcome(self, source: StatusSource, error: Optional[str]):
+        """Count consecutive failures of a source and rebuild its pool past max_failures"""
+        source_key = source.source_key
+        if not error:
+            self.failures[source_key] = 0
+            return
+
+        self.failures[source_key] = self.failures.get(source_key, 0) + 1
+        if self.failures[source_key] < self.max_failures:
+            return
+
+        logging.warning(f"{source_key} failed {self.failures[source_key]} times in a row, rebuilding its pool")
+        async with self.locks.setdefault(source_key, asyncio.Lock()):
+            try:
+                await source.rebuild()
+                self.failures[source_key] = 0
+            except Exception as e:
+                logging.error(f"Error rebuilding pool for {source_key}: {e}")
+
+    def pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Pool counters of every cached source"""
+        return {
+            source_key: {**source.pool_stats(), "failures": self.failures.get(source_key, 0)}
+            for source_key, source in self.sources.items()
+        }
+
     async def close_all_connections(self):
         """Close all active database connections"""
-        for connector in self.aws_connectors.values():
-            await connector.close()
-        
-        for connector in self.oracle_connectors.values():
-            await connector.close()
-            
-        self.aws_connectors = {}
-        self.oracle_connectors = {}
-    
+        for source in self.sources.values():
+            await source.close()
+
+        self.sources = {}
+
+    async def health(self) -> Dict[str, Dict[str, Any]]:
+        """Health of every cached source"""
+        keys = list(self.sources)
+        results = await asyncio.gather(*(self.sources[key].health() for key in keys))
+        return dict(zip(keys, results))
+
     async def get_flow_status(
-        self, 
-        aws_connector: AWSConnector, 
-        oracle_connector: OracleConnector,
-        aws_mappings: Dict[str, str], 
-        onprem_mappings: Dict[str, Dict[str, int]]
+        self,
+        sources: Dict[str, StatusSource],
+        mappings: Dict[str, Dict[str, Any]]
     ) -> Dict[str, Any]:
-        """Get status for all stages in a flow"""
-        result = {}
-        
-        # Get AWS status
-        try:
-            dag_ids = list(aws_mappings.values())
-            aws_status = await aws_connector.get_dag_status(dag_ids)
-            
-            # Map DAG status to stage status
-            for stage_name, dag_id in aws_mappings.items():
-                if dag_id in aws_status:
-                    dag_state = aws_status[dag_id].get('state', 'unknown')
-                    
-                    # Map Airflow state to our status
-                    status = {
-                        'success': 'completed',
-                        'running': 'running',
-                        'failed': 'failed',
-                        'queued': 'pending',
-                        'scheduled': 'pending'
-                    }.get(dag_state.lower(), dag_state.lower())
-                    
-                    result[stage_name] = {
-                        'status': status,
-                        'start_time': aws_status[dag_id].get('start_date'),
-                        'end_time': aws_status[dag_id].get('end_date'),
-                        'details': aws_status[dag_id]
-                    }
-                else:
-                    result[stage_name] = {
-                        'status': 'unknown',
-                        'start_time': None,
-                        'end_time': None,
-                        'details': {}
-                    }
-        except Exception as e:
-            logging.error(f"Error fetching AWS status: {e}")
-            # Set all AWS stages to error status
-            for stage_name in aws_mappings:
-                result[stage_name] = {
-                    'status': 'error',
-                    'start_time': None,
-                    'end_time': None,
-                    'details': {'error': str(e)}
-                }
-        
-        # Get Oracle status
-        try:
-            oracle_status = await oracle_connector.get_stage_status(onprem_mappings)
-            
-            # Oracle status is already mapped to stage names
-            for stage_name, status_info in oracle_status.items():
-                # Map Oracle status to our status format
-                oracle_status_value = status_info.get('status', '').lower()
-                status = {
-                    'not_started': 'pending',
-                    'running': 'running',
-                    'failed': 'failed',
-                    'completed': 'completed'
-                }.get(oracle_status_value, oracle_status_value)
-                
-                result[stage_name] = {
-                    'status': status,
-                    'start_time': status_info.get('start_date'),
-                    'end_time': status_info.get('end_date'),
-                    'details': status_info
+        """
+        Get status for all stages in a flow
+
+        Args:
+            sources: Dict mapping source names to sources
+            mappings: Dict mapping source names to the stage mappings of that source
+        """
+        result = await self.get_group_status(sources, {"flow": mappings})
+        return result["flow"]
+
+    async def get_group_status(
+        self,
+        sources: Dict[str, Union[StatusSource, Dict[str, Any]]],
+        flows: Dict[str, Dict[str, Dict[str, Any]]],
+        on_partial: Optional[Callable[[str, Dict[str, Dict[str, Any]]], Awaitable[None]]] = None,
+        timeouts: Optional[Dict[str, float]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Get status for several flows that share the same sources
+
+        The stage mappings of all flows are unioned per source so that each source
+        is queried once, then the rows are fanned back out per flow. Sources are
+        connected and queried concurrently, each under its own timeout; a source
+        that fails to connect, fails or times out only marks its own stages as error.
+
+        Args:
+            sources: Dict mapping source names to sources, or to {type, params, pool}
+                configs of sources that are created on first use
+            flows: Dict mapping flow names to {source name: stage mappings} Dict
+            on_partial: Coroutine called as on_partial(source, status) with the
+                per-flow stages of each source as soon as that source is done
+            timeouts: Per source name overrides of the type's timeout, in seconds
+
+        Returns:
+            Dict mapping flow names to stage status
+        """
+        result = {flow_name: {} for flow_name in flows}
+        timeouts = timeouts or {}
+
+        async def fetch(name: str, source: Union[StatusSource, Dict[str, Any]]):
+            if not isinstance(source, StatusSource):
+                source = await self.get_source(source["type"], source["params"], source.get("pool"))
+
+            # Union the mappings of every flow, keyed by the row they point to
+            keys = {}
+            for flow in flows.values():
+                for mapping in flow.get(name, {}).values():
+                    keys.setdefault(source.mapping_key(mapping), mapping)
+            return source, await source.batch_fetch(keys)
+
+        async def collect(name: str, source: Union[StatusSource, Dict[str, Any]]):
+            if not any(flow.get(name) for flow in flows.values()):
+                return
+
+            if isinstance(source, StatusSource):
+                type_name, source_key = source.type_name, source.source_key or name
+            else:
+                type_name, source_key = source["type"], self.source_key(source["type"], source["params"])
+            timeout = timeouts.get(name) or self.timeouts.get(type_name, self.default_timeout)
+            started = time.monotonic()
+            error = None
+            try:
+                # Connecting counts against the timeout, so an unreachable host can't hold up the others
+                source, rows = await asyncio.wait_for(fetch(name, source), timeout)
+                partial = {
+                    flow_name: source.map_status({
+                        stage_name: rows.get(source.mapping_key(mapping))
+                        for stage_name, mapping in flow.get(name, {}).items()
+                    })
+                    for flow_name, flow in flows.items()
                 }
-        except Exception as e:
-            logging.error(f"Error fetching Oracle status: {e}")
-            # Set all Oracle stages to error status
-            for stage_name in onprem_mappings:
-                result[stage_name] = {
-                    'status': 'error',
-                    'start_time': None,
-                    'end_time': None,
-                    'details': {'error': str(e)}
+            except asyncio.TimeoutError:
+                error = f"{name} status query timed out after {timeout}s"
+            except Exception as e:
+                error = str(e)
+
+            latency = time.monotonic() - started
+            SOURCE_QUERY_SECONDS.observe(latency, source=source_key, type=type_name)
+            if error:
+                SOURCE_ERRORS.inc(source=source_key, type=type_name)
+                logging.error(f"Error fetching {name} status: {error}")
+                partial = {
+                    flow_name: self.error_status(flow.get(name, {}), error)
+                    for flow_name, flow in flows.items()
                 }
-        
+
+            if isinstance(source, StatusSource):
+                # A source that never connected has no pool to rebuild
+                await self.record_outcome(source, error)
+            self.source_stats[source_key] = {
+                "source": name,
+                "latency": latency,
+                "error": error,
+                "checked_at": datetime.now()
+            }
+            logging.debug(f"Fetched {name} status from {source_key} in {latency:.3f}s")
+
+            for flow_name, stages in partial.items():
+                result[flow_name].update(stages)
+            if on_partial:
+                try:
+                    await on_partial(name, partial)
+                except Exception as e:
+                    logging.error(f"Error publishing partial {name} status: {e}")
+
+        await asyncio.gather(*(collect(name, source) for name, source in sources.items()))
         return result
+
+    @staticmethod
+    def error_status(mappings: Dict[str, Any], error: Any) -> Dict[str, Any]:
+        """Set all stages of a source to error status"""
+        return {
+            stage_name: {
+                'status': 'error',
+                'start_time': None,
+                'end_time': None,
+                'details': {'error': str(error)}
+            }
+            for stage_name in mappings
+        }
+
+    @staticmethod
+    def summarize(stages: Dict[str, Dict]) -> Dict[str, Any]:
+        """Stage counts by status and the worst status of a flow"""
+        counts = {}
+        for stage in stages.values():
+            status = (stage or {}).get('status') or 'unknown'
+            counts[status] = counts.get(status, 0) + 1
+
+        def severity(status: str) -> int:
+            if status in STATUS_SEVERITY:
+                return STATUS_SEVERITY.index(status)
+            return STATUS_SEVERITY.index('unknown')
+
+        return {
+            'total': len(stages),
+            'counts': counts,
+            'worst': min(counts, key=severity) if counts else None
+        }
@@ -0,0 +1,85 @@
+# services/task_service.py
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+
+from database.status_source import StatusSource
+
+class TaskService:
+    """
+    On-demand task drill-down of a stage's latest run
+
+    Nothing is fetched until a client asks for a stage's tasks. Pages are cached
+    per (source, mapping, run) together with the stage status they were read
+    under: a status change drops the run's pages, and pages of a finished run
+    are served from the cache for as long as it is kept. Pages of a run still
+    in progress expire after running_ttl seconds so its tasks don't go stale.
+    Each run keeps at most max_pages pages, since the cursors come from clients.
+    """
+
+    # Stage status after which a run's tasks no longer change
+    FINISHED = ("completed", "failed")
+
+    def __init__(self, max_runs: int = 256, running_ttl: float = 30.0, max_pages: int = 32):
+        self.max_runs = max_runs  # Runs kept, least recently used dropped first
+        self.running_ttl = running_ttl  # seconds
+        self.max_pages = max_pages  # Pages kept per run, least recently used dropped first
+        self.runs: "OrderedDict[Tuple[str, str, str], Dict[str, Any]]" = OrderedDict()
+        self.inflight: Dict[Tuple, asyncio.Task] = {}  # Shared fetch per page
+
+    async def get_tasks(
+        self,
+        source: StatusSource,
+        mapping: Any,
+        run_key: str,
+        status: str,
+        after: Optional[str] = None,
+        limit: int = 100
+    ) -> Dict[str, Any]:
+        """
+        Get one page of a run's tasks
+
+        Args:
+            status: Current status of the stage, invalidates pages read under another
+            after: Cursor returned as "next" by the previous page
+
+        Returns:
+            Dict with tasks, next (None on the last page) and cached
+        """
+        key = (source.source_key, source.mapping_key(mapping), run_key)
+        entry = self.runs.get(key)
+        if entry is None or entry["status"] != status:
+            entry = self.runs[key] = {"status": status, "pages": OrderedDict()}
+        self.runs.move_to_end(key)
+        while len(self.runs) > self.max_runs:
+            self.runs.popitem(last=False)
+
+        page_key = (after, limit)
+        page = entry["pages"].get(page_key)
+        if page and (status in self.FINISHED or time.monotonic() - page["fetched_at"] < self.running_ttl):
+            entry["pages"].move_to_end(page_key)
+            return {"tasks": page["tasks"], "next": page["next"], "cached": True}
+
+        # Concurrent expansions of the same stage share one query
+        fetch_key = key + (status, page_key)
+        task = self.inflight.get(fetch_key)
+        if task is None:
+            task = asyncio.create_task(source.fetch_tasks(mapping, run_key, after, limit))
+            self.inflight[fetch_key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(fetch_key, None))
+        else:
+            logging.debug(f"Joining in-flight task fetch for {key}")
+        tasks: List[Dict[str, Any]] = await asyncio.shield(task)
+
+        page = {
+            "tasks": tasks,
+            "next": tasks[-1]["task_id"] if len(tasks) == limit else None,
+            "fetched_at": time.monotonic()
+        }
+        entry["pages"][page_key] = page
+        entry["pages"].move_to_end(page_key)
+        while len(entry["pages"]) > self.max_pages:
+            entry["pages"].popitem(last=False)
+        return {"tasks": page["tasks"], "next": page["next"], "cached": False}
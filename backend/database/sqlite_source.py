@@ -0,0 +1,145 @@
+# database/sqlite_source.py
+import asyncio
+import sqlite3
+import logging
+import re
+import time
+from typing import Dict, List, Optional, Any
+
+from database.status_source import StatusSource, register_source
+
+@register_source("sqlite")
+class SQLiteSource(StatusSource):
+    """
+    Local SQLite stand-in for a status database, for tests and offline runs
+
+    Not registered by the app: only code that imports this module (the
+    benchmarks, tests) can use the "sqlite" type, so an uploaded config can't
+    open or create files through it.
+
+    Stage mappings are plain keys looked up in a table with the columns
+    (key, status, start_date, end_date). Status values use the tracker's own
+    names (pending, running, completed, failed). latency adds a delay in
+    seconds to every query, to stand in for a remote database in benchmarks.
+
+    Task drill-down reads task_table with the columns (key, run, task_id,
+    status, start_date, end_date), where run is the start_date of the stage row.
+    """
+
+    # SQLite allows at most 999 bound variables per statement in older builds
+    MAX_KEYS_PER_QUERY = 500
+
+    @classmethod
+    def connector_key(cls, params: Dict[str, Any]) -> str:
+        return f"{params.get('path')}:{params.get('table', 'stage_status')}"
+
+    def __init__(
+        self,
+        path: str,
+        table: str = "stage_status",
+        latency: float = 0.0,
+        task_table: str = "task_instance"
+    ):
+        for identifier in (table, task_table):
+            # Table names are put into the SQL text
+            if not re.fullmatch(r"\w+", identifier):
+                raise ValueError(f"Invalid SQLite table name: {identifier!r}")
+        self.path = path
+        self.table = table
+        self.task_table = task_table
+        self.latency = float(latency)
+        self.conn = None
+
+    async def connect(self):
+        if not self.conn:
+            self.conn = await asyncio.to_thread(sqlite3.connect, self.path, check_same_thread=False)
+            logging.info(f"Connected to SQLite database {self.path}")
+
+    async def close(self):
+        if self.conn:
+            await asyncio.to_thread(self.conn.close)
+            self.conn = None
+            logging.info(f"Closed connection to SQLite database {self.path}")
+
+    async def ping(self):
+        if not self.conn:
+            await self.connect()
+        await asyncio.to_thread(self.conn.execute, "SELECT 1")
+
+    async def batch_fetch(self, keys: Dict[str, Any]) -> Dict[str, Dict]:
+        if not self.conn:
+            await self.connect()
+        return await asyncio.to_thread(self._fetch, list(keys))
+
+    def _fetch(self, keys: List[str]) -> Dict[str, Dict]:
+        result = {}
+        for offset in range(0, len(keys), self.MAX_KEYS_PER_QUERY):
+            chunk = keys[offset:offset + self.MAX_KEYS_PER_QUERY]
+            placeholders = ', '.join(['?'] * len(chunk))
+            if self.latency:
+                time.sleep(self.latency)
+            rows = self.conn.execute(
+                f"SELECT key, status, start_date, end_date FROM {self.table} WHERE key IN ({placeholders})",
+                chunk
+            ).fetchall()
+            self.rows_fetched += len(rows)
+            for row in rows:
+                result[row[0]] = {
+                    'status': row[1],
+                    'start_date': row[2],
+                    'end_date': row[3]
+                }
+        return result
+
+    def map_status(self, stage_rows: Dict[str, Optional[Dict]]) -> Dict[str, Any]:
+        result = {}
+        for stage_name, row in stage_rows.items():
+            if row is None:
+                result[stage_name] = {
+                    'status': 'not_found',
+                    'start_time': None,
+                    'end_time': None,
+                    'details': {}
+                }
+                continue
+
+            result[stage_name] = {
+                'status': (row.get('status') or 'unknown').lower(),
+                'start_time': row.get('start_date'),
+                'end_time': row.get('end_date'),
+                'details': row
+            }
+        return result
+
+    def run_key(self, details: Dict[str, Any]) -> Optional[str]:
+        return details.get('start_date')
+
+    async def fetch_tasks(
+        self,
+        mapping: Any,
+        run_key: str,
+        after: Optional[str] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        if not self.conn:
+            await self.connect()
+        return await asyncio.to_thread(self._fetch_tasks, mapping, run_key, after, limit)
+
+    def _fetch_tasks(self, key: str, run: str, after: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        if self.latency:
+            time.sleep(self.latency)
+        rows = self.conn.execute(
+            f"SELECT task_id, status, start_date, end_date FROM {self.task_table} "
+            "WHERE key = ? AND run = ? AND task_id > ? ORDER BY task_id LIMIT ?",
+            (key, run, after or "", limit)
+        ).fetchall()
+        return [
+            {
+                'task_id': row[0],
+                'status': (row[1] or 'pending').lower(),
+                'start_time': row[2],
+                'end_time': row[3],
+                'details': {'status': row[1], 'start_date': row[2], 'end_date': row[3]}
+            }
+            for row in rows
+        ]
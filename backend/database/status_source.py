@@ -0,0 +1,238 @@
+# database/status_source.py
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Any, Optional, Type
+
+# Pool options used when neither Settings nor the flow config override them
+DEFAULT_POOL_OPTIONS = {
+    "min_size": 1,
+    "max_size": 10,
+    "acquire_timeout": 10.0,  # seconds to wait for a free connection
+    "recycle": 3600,  # seconds before an idle connection is replaced
+    "pre_ping": True  # check a connection before handing it out
+}
+
+class StatusSource:
+    """
+    Base class for status source plugins
+
+    A source is created from one entry of a flow's "databases" config, is shared by
+    every flow with the same connector key, and answers batched lookups for the
+    stage mappings of all those flows at once.
+    """
+
+    # Config fields that identify the connection, joined into the connector key
+    key_fields = ("host", "database", "user")
+    type_name = None  # Set by register_source
+    source_key = None  # Set by StatusService when the source is cached
+    params = None  # Config the source was created from, set by StatusService
+    pool_options = DEFAULT_POOL_OPTIONS
+    pool_counters = None
+    rows_fetched = 0  # Rows the database returned, over the life of the source
+
+    @classmethod
+    def from_config(cls, params: Dict[str, Any]) -> "StatusSource":
+        """Create a source from its database config entry"""
+        return cls(**params)
+
+    @classmethod
+    def connector_key(cls, params: Dict[str, Any]) -> str:
+        """Key under which a source is shared"""
+        return ":".join(str(params.get(field, "")) for field in cls.key_fields)
+
+    async def connect(self):
+        raise NotImplementedError
+
+    async def close(self):
+        raise NotImplementedError
+
+    async def rebuild(self):
+        """Close the pool and open a fresh one"""
+        try:
+            await self.close()
+        except Exception as e:
+            logging.warning(f"Error closing {self.source_key} before rebuild: {e}")
+        await self.connect()
+        logging.info(f"Rebuilt connection pool for {self.source_key}")
+
+    @asynccontextmanager
+    async def acquire(self):
+        """
+        Borrow a pooled connection, bounded by the acquire timeout
+
+        Tracks in-use count and wait time, and pings the connection first when
+        pre_ping is set.
+        """
+        if self.pool_counters is None:
+            self.pool_counters = {"in_use": 0, "acquired": 0, "wait_time": 0.0, "max_wait_time": 0.0}
+        counters = self.pool_counters
+
+        started = time.monotonic()
+        conn = await asyncio.wait_for(self._acquire_connection(), self.pool_options["acquire_timeout"])
+        waited = time.monotonic() - started
+        counters["acquired"] += 1
+        counters["wait_time"] += waited
+        counters["max_wait_time"] = max(counters["max_wait_time"], waited)
+        counters["in_use"] += 1
+        try:
+            if self.pool_options["pre_ping"]:
+                await self._ping_connection(conn)
+            yield conn
+        finally:
+            counters["in_use"] -= 1
+            await self._release_connection(conn)
+
+    async def _acquire_connection(self):
+        raise NotImplementedError
+
+    async def _release_connection(self, conn):
+        raise NotImplementedError
+
+    async def _ping_connection(self, conn):
+        pass
+
+    def pool_size(self) -> Optional[int]:
+        """Open connections in the pool, None if unknown"""
+        return None
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """In-use, idle and wait time counters of the pool"""
+        counters = self.pool_counters or {"in_use": 0, "acquired": 0, "wait_time": 0.0, "max_wait_time": 0.0}
+        size = self.pool_size()
+        return {
+            "size": size,
+            "in_use": counters["in_use"],
+            "idle": None if size is None else max(size - counters["in_use"], 0),
+            "max_size": self.pool_options["max_size"],
+            "acquired": counters["acquired"],
+            "avg_wait_time": counters["wait_time"] / counters["acquired"] if counters["acquired"] else 0.0,
+            "max_wait_time": counters["max_wait_time"]
+        }
+
+    async def health(self) -> Dict[str, Any]:
+        """Run a trivial query and report whether the source answered"""
+        started = time.monotonic()
+        try:
+            await self.ping()
+            return {"ok": True, "latency": time.monotonic() - started, "error": None}
+        except Exception as e:
+            return {"ok": False, "latency": time.monotonic() - started, "error": str(e)}
+
+    async def ping(self):
+        raise NotImplementedError
+
+    def mapping_key(self, mapping: Any) -> str:
+        """Key identifying the row a stage mapping points to, shared across flows"""
+        return str(mapping)
+
+    async def batch_fetch(self, keys: Dict[str, Any]) -> Dict[str, Dict]:
+        """
+        Fetch the raw rows for many stage mappings in one round
+
+        Args:
+            keys: Dict mapping mapping_key() to the stage mapping
+
+        Returns:
+            Dict mapping mapping_key() to the raw row
+        """
+        raise NotImplementedError
+
+    def map_status(self, stage_rows: Dict[str, Optional[Dict]]) -> Dict[str, Any]:
+        """
+        Map raw rows to stage status
+
+        Args:
+            stage_rows: Dict mapping stage names to their raw row, None if not returned
+
+        Returns:
+            Dict mapping stage names to {status, start_time, end_time, details}
+        """
+        raise NotImplementedError
+
+    def run_key(self, details: Dict[str, Any]) -> Optional[str]:
+        """
+        Identify the run behind a stage status from its details, None if the
+        source has no task drill-down or the stage has not run
+        """
+        return None
+
+    async def fetch_tasks(
+        self,
+        mapping: Any,
+        run_key: str,
+        after: Optional[str] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetch one page of the tasks of a run, ordered by task id
+
+        Args:
+            mapping: Stage mapping the run belongs to
+            run_key: Run as returned by run_key()
+            after: Task id of the last task of the previous page, None for the first page
+            limit: Maximum number of tasks returned
+
+        Returns:
+            List of {task_id, status, start_time, end_time, details}
+        """
+        raise NotImplementedError
+
+# Registry of source types by the "type" field of a database config
+SOURCE_TYPES: Dict[str, Type[StatusSource]] = {}
+
+# Type and stageMappings key for database entries that don't name them
+DEFAULT_SOURCE_TYPES = {"aws": "airflow", "oracle": "oracle"}
+DEFAULT_MAPPING_KEYS = {"oracle": "onPrem"}
+
+def register_source(type_name: str):
+    """Class decorator registering a StatusSource under a config type"""
+    def decorator(cls: Type[StatusSource]) -> Type[StatusSource]:
+        SOURCE_TYPES[type_name] = cls
+        cls.type_name = type_name
+        return cls
+    return decorator
+
+def get_source_type(type_name: str) -> Type[StatusSource]:
+    """Look up a registered source type"""
+    if type_name not in SOURCE_TYPES:
+        raise ValueError(f"Unknown status source type: {type_name}")
+    return SOURCE_TYPES[type_name]
+
+def resolve_sources(
+    databases: Dict[str, Dict[str, Any]],
+    stage_mappings: Dict[str, Dict[str, Any]]
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Resolve the sources of a flow config
+
+    Each entry of "databases" may set "type" (default from DEFAULT_SOURCE_TYPES),
+    "mappings", the stageMappings key of its stages (default from
+    DEFAULT_MAPPING_KEYS, else the entry name), "timeout" in seconds and "pool",
+    overrides of DEFAULT_POOL_OPTIONS.
+
+    Returns:
+        Dict mapping source names to {type, params, key, mappings, timeout, pool}
+    """
+    sources = {}
+    for name, entry in databases.items():
+        params = dict(entry)
+        type_name = params.pop("type", DEFAULT_SOURCE_TYPES.get(name, name))
+        mappings_key = params.pop("mappings", DEFAULT_MAPPING_KEYS.get(name, name))
+        timeout = params.pop("timeout", None)
+        pool_options = params.pop("pool", {})
+        source_type = get_source_type(type_name)
+
+        if mappings_key not in stage_mappings:
+            logging.warning(f"No stageMappings[{mappings_key!r}] for source {name}")
+
+        sources[name] = {
+            "type": type_name,
+            "params": params,
+            "key": f"{type_name}:{source_type.connector_key(params)}",
+            "mappings": stage_mappings.get(mappings_key, {}),
+            "timeout": timeout,
+            "pool": pool_options
+        }
+    return sources
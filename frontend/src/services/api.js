@@ -53,6 +53,25 @@ export const fetchFlowStatus = async (flowName) => {
   }
 };
 
+// Get one page of the tasks of a stage's latest run, only when the stage is expanded
+export const fetchStageTasks = async (flowName, stageName, after = null) => {
+  if (USE_MOCKS) {
+    console.log(`Using mock data for tasks: ${flowName}/${stageName}`);
+    return { tasks: [], next: null };
+  }
+
+  try {
+    const response = await axios.get(
+      `${API_BASE_URL}/flows/${flowName}/stages/${encodeURIComponent(stageName)}/tasks`,
+      { params: after ? { after } : {} }
+    );
+    return response.data;
+  } catch (error) {
+    console.error(`Error fetching tasks for ${flowName}/${stageName}:`, error);
+    throw error;
+  }
+};
+
 // Get list of available configurations
 export const fetchConfigs = async () => {
   if (USE_MOCKS) {
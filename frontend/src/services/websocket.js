@@ -3,6 +3,50 @@ import { USE_MOCKS, mockStatusData } from '../mocks';
 
 let websocket = null;
 let mockInterval = null;
+let reconnectTimer = null;
+let reconnectAttempts = 0;
+
+// Last known state per flow, rebuilt from snapshot and delta messages
+const flowStates = {};
+
+// Message handlers per subscribed flow
+const subscribers = {};
+
+// Apply a snapshot or delta message, returns the full status or null on a version gap
+const applyStatusMessage = (message) => {
+  const { flowName } = message;
+
+  if (message.type === 'snapshot') {
+    flowStates[flowName] = {
+      epoch: message.epoch,
+      version: message.version,
+      timestamp: message.timestamp,
+      stages: { ...message.stages }
+    };
+  } else if (message.type === 'delta') {
+    const state = flowStates[flowName];
+    if (!state || state.version !== message.baseVersion) {
+      return null;
+    }
+    const stages = { ...state.stages, ...message.stages };
+    (message.removed || []).forEach((stageName) => delete stages[stageName]);
+    flowStates[flowName] = {
+      epoch: message.epoch,
+      version: message.version,
+      timestamp: message.timestamp,
+      stages
+    };
+  } else {
+    // Full status update
+    return message;
+  }
+
+  return {
+    flowName,
+    timestamp: flowStates[flowName].timestamp,
+    stages: flowStates[flowName].stages
+  };
+};
 
 export const setupWebSocket = (flowName, onMessage) => {
   // If using mocks, set up a simulated WebSocket with interval updates
@@ -57,48 +101,116 @@ export const setupWebSocket = (flowName, onMessage) => {
     };
   }
   
-  // Regular WebSocket code for non-mock mode
-  // Close existing connection if any
-  if (websocket) {
-    websocket.close();
+  // Share one multiplexed socket between all flows
+  if (!subscribers[flowName]) {
+    subscribers[flowName] = new Set();
   }
-  
+  const isNewFlow = subscribers[flowName].size === 0;
+  subscribers[flowName].add(onMessage);
+
+  if (!websocket || websocket.readyState === WebSocket.CLOSED) {
+    openSocket();
+  } else if (isNewFlow) {
+    subscribe([flowName]);
+  }
+
+  return {
+    close: () => {
+      const handlers = subscribers[flowName];
+      if (!handlers) {
+        return;
+      }
+      handlers.delete(onMessage);
+      if (handlers.size === 0) {
+        delete subscribers[flowName];
+        sendMessage({ type: 'unsubscribe', flows: [flowName] });
+      }
+    }
+  };
+};
+
+const sendMessage = (message) => {
+  if (websocket && websocket.readyState === WebSocket.OPEN) {
+    websocket.send(JSON.stringify(message));
+  }
+};
+
+// Subscribe with the last applied version so the server can resume with a delta
+const subscribe = (flowNames) => {
+  sendMessage({
+    type: 'subscribe',
+    flows: flowNames.map((flowName) => {
+      const state = flowStates[flowName];
+      return state
+        ? { flowName, version: state.version, epoch: state.epoch }
+        : { flowName };
+    })
+  });
+};
+
+const openSocket = () => {
   // Determine WebSocket URL based on current window location
   const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-  const wsUrl = `${protocol}//${window.location.host}/ws/${flowName}`;
-  
-  // Create new WebSocket connection
+  const wsUrl = `${protocol}//${window.location.host}/ws`;
+
   websocket = new WebSocket(wsUrl);
-  
+
   websocket.onopen = () => {
-    console.log(`WebSocket connection established for ${flowName}`);
+    console.log('WebSocket connection established');
+    reconnectAttempts = 0;
+    subscribe(Object.keys(subscribers));
   };
-  
+
   websocket.onmessage = (event) => {
     try {
-      const data = JSON.parse(event.data);
-      if (onMessage && typeof onMessage === 'function') {
-        onMessage(data);
+      const message = JSON.parse(event.data);
+      if (message.type === 'ping') {
+        sendMessage({ type: 'pong' });
+        return;
+      }
+      if (message.type === 'error') {
+        console.error(`WebSocket error for ${message.flowName}: ${message.detail}`);
+        return;
+      }
+
+      const handlers = subscribers[message.flowName];
+      if (!handlers) {
+        return;
       }
+      const data = applyStatusMessage(message);
+      if (!data) {
+        // Missed a version, ask the server for a full snapshot
+        sendMessage({ type: 'resync', flowName: message.flowName });
+        return;
+      }
+      handlers.forEach((handler) => {
+        if (typeof handler === 'function') {
+          handler(data);
+        }
+      });
     } catch (error) {
       console.error('Error parsing WebSocket message:', error);
     }
   };
-  
+
   websocket.onerror = (error) => {
     console.error('WebSocket error:', error);
   };
-  
+
   websocket.onclose = () => {
-    console.log(`WebSocket connection closed for ${flowName}`);
-    
-    // Attempt to reconnect after a delay
-    setTimeout(() => {
-      if (websocket.readyState === WebSocket.CLOSED) {
-        setupWebSocket(flowName, onMessage);
+    console.log('WebSocket connection closed');
+    if (reconnectTimer || Object.keys(subscribers).length === 0) {
+      return;
+    }
+
+    // Back off with jitter so clients don't reconnect all at once after a deploy
+    const delay = Math.min(30000, 1000 * 2 ** reconnectAttempts) * (0.5 + Math.random());
+    reconnectAttempts += 1;
+    reconnectTimer = setTimeout(() => {
+      reconnectTimer = null;
+      if (Object.keys(subscribers).length > 0) {
+        openSocket();
       }
-    }, 5000);
+    }, delay);
   };
-  
-  return websocket;
 };